@@ -0,0 +1,151 @@
+import functools
+import io
+import subprocess
+
+import numpy as np
+from scipy.signal import lfilter
+
+SAMPLE_RATE = 48000
+PEAKS_PER_SECOND = 20
+REPLAY_GAIN_REFERENCE = -18.0
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+FEATURE_SAMPLE_RATE = 16000
+FRAME_SIZE = 1024
+FRAME_HOP = 512
+MAX_FRAMES = 4000
+MEL_BANDS = 40
+MFCC_COUNT = 13
+SILENCE_RMS = 1e-4
+# ITU-R BS.1770 K-weighting (high shelf then high pass), coefficients for 48 kHz.
+K_WEIGHTING = (
+    ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585]),
+    ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621]),
+)
+
+
+def decode_pcm(ffmpeg, source_path, sample_rate=SAMPLE_RATE):
+    result = subprocess.run([
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-i', source_path,
+        '-vn', '-map', '0:a:0', '-ac', '2', '-ar', str(sample_rate), '-f', 'f32le', '-',
+    ], check=True, capture_output=True)
+    samples = np.frombuffer(result.stdout, dtype='<f4').reshape(-1, 2)
+    if np.array_equal(samples[:, 0], samples[:, 1]):
+        samples = samples[:, :1]
+    return samples
+
+
+def compute_peaks(samples, sample_rate=SAMPLE_RATE, per_second=PEAKS_PER_SECOND):
+    hop = sample_rate // per_second
+    count = -(-len(samples) // hop)
+    if not count:
+        return np.zeros(0, dtype=np.uint8)
+    magnitudes = np.abs(samples).max(axis=1)
+    padded = np.zeros(count * hop, dtype=magnitudes.dtype)
+    padded[:len(magnitudes)] = magnitudes
+    peaks = padded.reshape(count, hop).max(axis=1)
+    loudest = peaks.max()
+    if loudest > 0:
+        peaks = peaks / loudest
+    return np.round(peaks * 255).astype(np.uint8)
+
+
+def k_weight(channel):
+    for b, a in K_WEIGHTING:
+        channel = lfilter(b, a, channel)
+    return channel
+
+
+def integrated_loudness(samples):
+    block = int(BLOCK_SECONDS * SAMPLE_RATE)
+    step = int(BLOCK_STEP_SECONDS * SAMPLE_RATE)
+    if len(samples) < block:
+        return None
+    starts = np.arange(0, len(samples) - block + 1, step)
+    energy = np.zeros(len(starts))
+    for channel in samples.T:
+        weighted = k_weight(channel.astype(np.float64))
+        cumulative = np.concatenate(([0.0], np.cumsum(weighted * weighted)))
+        energy += (cumulative[starts + block] - cumulative[starts]) / block
+    gated = energy[energy > 10 ** ((ABSOLUTE_GATE + 0.691) / 10)]
+    if not len(gated):
+        return None
+    gated = gated[gated > gated.mean() * 10 ** (RELATIVE_GATE / 10)]
+    return round(float(-0.691 + 10 * np.log10(gated.mean())), 2)
+
+
+@functools.lru_cache(maxsize=2)
+def mel_filterbank(frame_size, sample_rate, bands):
+    to_mel = lambda hz: 2595 * np.log10(1 + hz / 700)
+    to_hz = lambda mel: 700 * (10 ** (mel / 2595) - 1)
+    bins = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+    edges = to_hz(np.linspace(to_mel(20), to_mel(sample_rate / 2), bands + 2))
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    return np.maximum(0, np.minimum((bins - lower) / (centre - lower), (upper - bins) / (upper - centre)))
+
+
+@functools.lru_cache(maxsize=2)
+def dct_matrix(bands, count):
+    matrix = np.cos(np.pi / bands * (np.arange(bands) + 0.5) * np.arange(count)[:, None]) * np.sqrt(2 / bands)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+@functools.lru_cache(maxsize=2)
+def chroma_map(frame_size, sample_rate):
+    bins = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+    matrix = np.zeros((12, len(bins)))
+    audible = np.flatnonzero((bins >= 55) & (bins <= 5000))
+    matrix[(np.round(12 * np.log2(bins[audible] / 440)).astype(int) + 9) % 12, audible] = 1
+    return matrix
+
+
+def compute_embedding(samples, sample_rate=SAMPLE_RATE):
+    step = sample_rate // FEATURE_SAMPLE_RATE
+    mono = samples.mean(axis=1)
+    mono = mono[:len(mono) // step * step].reshape(-1, step).mean(axis=1)
+    if len(mono) < FRAME_SIZE:
+        return None
+    starts = np.arange(0, len(mono) - FRAME_SIZE + 1, FRAME_HOP)
+    if len(starts) > MAX_FRAMES:
+        starts = starts[np.linspace(0, len(starts) - 1, MAX_FRAMES).astype(int)]
+    frames = mono[starts[:, None] + np.arange(FRAME_SIZE)]
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    audible = rms > SILENCE_RMS
+    if not audible.any():
+        return None
+    frames, rms = frames[audible] * np.hanning(FRAME_SIZE), rms[audible]
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-10
+    mfcc = np.log(power @ mel_filterbank(FRAME_SIZE, FEATURE_SAMPLE_RATE, MEL_BANDS).T + 1e-10) @ dct_matrix(MEL_BANDS, MFCC_COUNT).T
+    chroma = power @ chroma_map(FRAME_SIZE, FEATURE_SAMPLE_RATE).T
+    chroma /= chroma.sum(axis=1, keepdims=True)
+    centroid = power @ np.fft.rfftfreq(FRAME_SIZE, 1 / FEATURE_SAMPLE_RATE) / power.sum(axis=1) / (FEATURE_SAMPLE_RATE / 2)
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    return np.concatenate([
+        mfcc.mean(axis=0), mfcc.std(axis=0), chroma.mean(axis=0),
+        [centroid.mean(), centroid.std(), flatness.mean(), rms.std() / rms.mean()],
+    ]).astype(np.float32)
+
+
+def encode_peaks(peaks):
+    buffer = io.BytesIO()
+    np.save(buffer, peaks, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_peaks(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+def analyze_audio(source_path, ffmpeg='ffmpeg'):
+    samples = decode_pcm(ffmpeg, source_path)
+    loudness = integrated_loudness(samples)
+    embedding = compute_embedding(samples)
+    return {
+        'peaks': encode_peaks(compute_peaks(samples)),
+        'features': None if embedding is None else embedding.tobytes(),
+        'loudness': loudness,
+        'replay_gain': None if loudness is None else round(REPLAY_GAIN_REFERENCE - loudness, 2),
+    }
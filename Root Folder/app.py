@@ -1,24 +1,112 @@
 import os
+import re
 import json
-import plotly.express as px
-from flask import Flask, request, render_template, redirect, url_for, session, flash, abort, jsonify
+import struct
+import click
+import hashlib
+import zipfile
+import tempfile
+import shutil
+import multiprocessing
+import signal
+from flask import Flask, Response, request, render_template, redirect, url_for, session, flash, abort, jsonify, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Column, Integer, String, ForeignKey, Date, desc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship
 from flask_login import UserMixin, LoginManager, login_user, logout_user, current_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.wsgi import wrap_file
+from urllib.parse import quote
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from werkzeug.utils import secure_filename
 from flask_wtf import FlaskForm
+from markupsafe import Markup
 from wtforms import PasswordField, SubmitField
 from wtforms.validators import DataRequired, Length, EqualTo
+from auth import RateLimiter, SessionUser, VerifierBusy, create_password_verifier
+from cache import create_cache
+from events import create_event_buffer
+from jobs import Worker, create_job_queue, describe_job
+from database import RoutingSession, configure_database, tune_engines
+from metrics import init_metrics
+from assets import init_assets
+from lyrics import decode_lyrics, encode_lyrics, lyrics_digest, parse_lrc, search_text
+from audio import read_metadata
+from storage import create_storage
+from transcode import transcode_to_hls
+from recommend import build_recommendations, rating_weight, PLAYLIST_WEIGHT, RECOMMENDATIONS_PER_USER
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'static/songs'
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///music_app_db.sqlite3"
 app.config["SECRET_KEY"] = "your_secret_key"
+app.config['STREAM_CHUNK_SIZE'] = 64 * 1024
+app.config['STREAM_MAX_AGE'] = 3600
+app.config['STREAM_ACCEL_REDIRECT'] = None
+app.config['CACHE_URL'] = None
+app.config['CACHE_MAX_ENTRIES'] = 2048
+app.config['CACHE_DEFAULT_TTL'] = 300
+app.config['AUDIO_STORAGE_URL'] = None
+app.config['AUDIO_STORAGE_ENDPOINT'] = None
+app.config['HLS_FOLDER'] = 'static/hls'
+app.config['FFMPEG_BINARY'] = 'ffmpeg'
+app.config['MEDIA_WORKERS'] = 2
+app.config['SQLALCHEMY_READ_DATABASE_URI'] = None
+app.config['SQLITE_BUSY_TIMEOUT'] = 5000
+app.config['SQLITE_MMAP_SIZE'] = 256 * 1024 * 1024
+app.config['DB_POOL_SIZE'] = 10
+app.config['DB_MAX_OVERFLOW'] = 20
+app.config['DB_POOL_RECYCLE'] = 1800
+app.config['DB_POOL_TIMEOUT'] = 30
+app.config['SLOW_QUERY_THRESHOLD'] = 0.1
+app.config['METRICS_TOKEN'] = None
+app.config['PROFILE_SAMPLE_RATE'] = 0.0
+app.config['PROFILER'] = 'cprofile'
+app.config['PROFILE_DIR'] = 'profiles'
+app.config['USER_CACHE_TTL'] = 60
+app.config['LOGIN_HASH_WORKERS'] = 4
+app.config['LOGIN_HASH_QUEUE'] = 16
+app.config['LOGIN_RATE_LIMIT'] = 10
+app.config['LOGIN_RATE_WINDOW'] = 60
+app.config['PLAY_EVENT_BUFFER_SIZE'] = 100000
+app.config['PLAY_EVENT_BATCH_SIZE'] = 500
+app.config['PLAY_EVENT_FLUSH_INTERVAL'] = 2.0
+app.config['PLAY_EVENT_DEDUP_WINDOW'] = 30
+app.config['CHART_WINDOW_HOURS'] = 168
+app.config['CHART_SIZE'] = 20
+app.config['SIMILARITY_INDEX_FOLDER'] = 'similarity'
+app.config['SIMILAR_SONGS'] = 8
+app.config['JOB_WORKER_THREADS'] = 4
+app.config['JOB_POLL_INTERVAL'] = 1.0
+app.config['JOB_BACKOFF_BASE'] = 10
+app.config['JOB_BACKOFF_CAP'] = 3600
+app.config['JOB_LEASE'] = 900
+app.config['JOB_RETENTION_DAYS'] = 7
+app.config.from_prefixed_env('MUSIC_APP')
+configure_database(app.config)
 login_manager = LoginManager(app)
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+tune_engines(app, db, functions={'lyrics_text': search_text})
+init_metrics(app, db)
+init_assets(app)
+cache = create_cache(app.config['CACHE_URL'], app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_DEFAULT_TTL'])
+password_verifier = create_password_verifier(app.config['LOGIN_HASH_WORKERS'], app.config['LOGIN_HASH_QUEUE'])
+login_limiter = RateLimiter(app.config['LOGIN_RATE_LIMIT'], app.config['LOGIN_RATE_WINDOW'])
+play_limiter = RateLimiter(1, app.config['PLAY_EVENT_DEDUP_WINDOW'])
+storage = create_storage(app.config['AUDIO_STORAGE_URL'], os.path.join(app.root_path, app.config['UPLOAD_FOLDER']),
+                         app.config['AUDIO_STORAGE_ENDPOINT'])
 ALLOWED_EXTENSIONS = {'mp3'}
+SEARCH_PAGE_SIZE = 20
+SEARCH_SUGGEST_LIMIT = 8
+CATALOG_PAGE_SIZE = 50
+CURSOR_FLOOR = datetime.min
+ADMIN_STATS_TTL = 60
+BULK_UPLOAD_CHUNK_SIZE = 1024 * 1024
+BULK_UPLOAD_MAX_FILES = 500
+BULK_UPLOAD_REPORT_EVERY = 10
 
 class User(db.Model):
     __tablename__ = "users"
@@ -56,18 +144,32 @@ class Admin(db.Model):
 
 class Song(db.Model):
     __tablename__ = "songs"
+    __table_args__ = (
+        db.Index('ix_songs_created_at_id', 'created_at', 'id'),
+        db.Index('ix_songs_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_songs_genre', 'genre'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255))
     title = db.Column(db.String(255), nullable=False)
     singer = db.Column(db.String(255))
     artist = db.Column(db.String(255), nullable=False)
-    lyrics = db.Column(db.Text)
     album = db.Column(db.String(255))
     release_date = db.Column(db.Date)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     genre = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     rating = db.Column(db.Float, default=0.0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    content_hash = db.Column(db.String(64), index=True)
+    duration = db.Column(db.Float)
+    bitrate = db.Column(db.Integer)
+    hls_ready = db.Column(db.Boolean, nullable=False, default=False)
+    loudness = db.Column(db.Float)
+    replay_gain = db.Column(db.Float)
+    peaks = db.deferred(db.Column(db.LargeBinary))
+    features = db.deferred(db.Column(db.LargeBinary))
     user_rating = db.relationship('Rating', backref='song', lazy=True, cascade='all, delete-orphan')
     playlists_association = db.relationship(
         "Playlist",
@@ -81,6 +183,9 @@ class Song(db.Model):
     )
     def __repr__(self):
         return f"<Song {self.filename}>"
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
     @staticmethod
     def get_total_tracks_count():
         return db.session.query(db.func.count(Song.id)).scalar()
@@ -91,55 +196,659 @@ class Song(db.Model):
     def get_song_count_by_genre():
         return db.session.query(Song.genre, db.func.count(Song.id)).group_by(Song.genre).all()
 
+class SongLyrics(db.Model):
+    __tablename__ = "song_lyrics"
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True)
+    body = db.Column(db.LargeBinary, nullable=False)
+    encoding = db.Column(db.String(10))
+    synced = db.Column(db.Boolean, nullable=False, default=False)
+    digest = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    @property
+    def text(self):
+        return decode_lyrics(self.body, self.encoding)
+    @staticmethod
+    def row(song_id, text):
+        body, encoding = encode_lyrics(text)
+        return {'song_id': song_id, 'body': body, 'encoding': encoding, 'synced': parse_lrc(text)[1],
+                'digest': lyrics_digest(text), 'updated_at': datetime.utcnow()}
+    @staticmethod
+    def save(song_id, text):
+        if not text or not text.strip():
+            SongLyrics.query.filter_by(song_id=song_id).delete()
+        else:
+            db.session.merge(SongLyrics(**SongLyrics.row(song_id, text)))
+        db.session.flush()
+    @staticmethod
+    def text_for(song_id):
+        entry = db.session.get(SongLyrics, song_id)
+        return entry.text if entry else ''
+
 class Playlist(db.Model):
     __tablename__ = "playlists"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     songs = db.relationship(
         "Song",
         secondary="playlist_song_association",
         back_populates="playlists_association",
+        order_by="playlist_song_association.c.position",
     )
     associated_songs = db.relationship(
         "Song",
         secondary="playlist_song_association",
         back_populates="playlists_association",
+        order_by="playlist_song_association.c.position",
     )
 
 playlist_song_association = db.Table(
     'playlist_song_association',
-    db.Column('playlist_id', db.Integer, db.ForeignKey('playlists.id')),
-    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'))
+    db.Column('playlist_id', db.Integer, db.ForeignKey('playlists.id'), primary_key=True),
+    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0, server_default='0'),
+    db.Index('ix_playlist_song_association_song_id', 'song_id'),
 )
 
 class Rating(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'song_id', name='uq_rating_user_song'),
+        db.Index('ix_rating_song_id_created_at', 'song_id', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Album(db.Model):
     __tablename__ = "albums"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
-    creator_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    creator_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     creator = db.relationship("User", backref=db.backref("albums", lazy=True))
     songs = db.relationship(
         "Song",
         secondary="album_song_association",
         back_populates="albums_association",
+        order_by="album_song_association.c.position",
     )
 
 album_song_association = db.Table(
     'album_song_association',
-    db.Column('album_id', db.Integer, db.ForeignKey('albums.id')),
-    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'))
+    db.Column('album_id', db.Integer, db.ForeignKey('albums.id'), primary_key=True),
+    db.Column('song_id', db.Integer, db.ForeignKey('songs.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0, server_default='0'),
+    db.Index('ix_album_song_association_song_id', 'song_id'),
 )
 
+class SongSimilarity(db.Model):
+    __tablename__ = "song_similarity"
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True)
+    similar_song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class UserRecommendation(db.Model):
+    __tablename__ = "user_recommendations"
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    @staticmethod
+    def replace(user_id, scored_songs):
+        UserRecommendation.query.filter_by(user_id=user_id).delete()
+        db.session.bulk_insert_mappings(UserRecommendation, [
+            {'user_id': user_id, 'rank': rank, 'song_id': song_id, 'score': score}
+            for rank, (song_id, score) in enumerate(scored_songs)
+        ])
+
+def user_interactions(user_id):
+    return db.union_all(
+        db.select(Rating.song_id, rating_weight(Rating.rating).label('weight')).where(Rating.user_id == user_id),
+        db.select(playlist_song_association.c.song_id, db.literal(PLAYLIST_WEIGHT).label('weight'))
+        .join(Playlist, Playlist.id == playlist_song_association.c.playlist_id)
+        .where(Playlist.user_id == user_id),
+    ).subquery()
+
+def refresh_user_recommendations(user_id):
+    interactions = user_interactions(user_id)
+    score = db.func.sum(SongSimilarity.score * interactions.c.weight)
+    scored_songs = (
+        db.session.query(SongSimilarity.similar_song_id, score)
+        .join(interactions, interactions.c.song_id == SongSimilarity.song_id)
+        .filter(SongSimilarity.similar_song_id.notin_(db.select(interactions.c.song_id)))
+        .group_by(SongSimilarity.similar_song_id)
+        .order_by(score.desc(), SongSimilarity.similar_song_id)
+        .limit(RECOMMENDATIONS_PER_USER)
+        .all()
+    )
+    UserRecommendation.replace(user_id, scored_songs)
+
+def rebuild_recommendations():
+    ratings = db.session.query(Rating.user_id, Rating.song_id, Rating.rating).all()
+    playlist_songs = (
+        db.session.query(Playlist.id, Playlist.user_id, playlist_song_association.c.song_id)
+        .join(playlist_song_association, playlist_song_association.c.playlist_id == Playlist.id)
+        .all()
+    )
+    neighbours, recommendations = build_recommendations(ratings, playlist_songs)
+    SongSimilarity.query.delete()
+    db.session.bulk_insert_mappings(SongSimilarity, [
+        {'song_id': song_id, 'similar_song_id': similar_song_id, 'score': score}
+        for song_id, similar in neighbours.items() for similar_song_id, score in similar
+    ])
+    UserRecommendation.query.delete()
+    for user_id, scored_songs in recommendations.items():
+        UserRecommendation.replace(user_id, scored_songs)
+    db.session.commit()
+    cache.invalidate(('recommendations', 'all'))
+    return len(neighbours), len(recommendations)
+
+class PlayEvent(db.Model):
+    __tablename__ = "play_events"
+    __table_args__ = (
+        db.Index('ix_play_events_played_at_song_id', 'played_at', 'song_id'),
+        db.Index('ix_play_events_user_id_played_at', 'user_id', 'played_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    played_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ChartEntry(db.Model):
+    __tablename__ = "charts"
+    chart = db.Column(db.String(255), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), nullable=False, index=True)
+    plays = db.Column(db.Integer, nullable=False)
+
+def rebuild_charts():
+    since = datetime.utcnow() - timedelta(hours=app.config['CHART_WINDOW_HOURS'])
+    plays = db.func.count(PlayEvent.id)
+    rows = (
+        db.session.query(PlayEvent.song_id, Song.genre, plays)
+        .join(Song, Song.id == PlayEvent.song_id)
+        .filter(PlayEvent.played_at >= since)
+        .group_by(PlayEvent.song_id, Song.genre)
+        .order_by(plays.desc(), PlayEvent.song_id)
+        .all()
+    )
+    charts = {}
+    for song_id, genre, count in rows:
+        for chart in ('global', f'genre:{genre}') if genre else ('global',):
+            entries = charts.setdefault(chart, [])
+            if len(entries) < app.config['CHART_SIZE']:
+                entries.append((song_id, count))
+    ChartEntry.query.delete()
+    db.session.bulk_insert_mappings(ChartEntry, [
+        {'chart': chart, 'rank': rank, 'song_id': song_id, 'plays': count}
+        for chart, entries in charts.items() for rank, (song_id, count) in enumerate(entries)
+    ])
+    db.session.commit()
+    cache.invalidate(('charts', 'all'))
+    return len(charts), len(rows)
+
+class TranscodeJob(db.Model):
+    __tablename__ = "transcode_jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('songs.id'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    timings = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index('ix_jobs_claim', 'status', 'priority', 'run_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    key = db.Column(db.String(200), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+job_queue = create_job_queue(db, Job, app.config['JOB_BACKOFF_BASE'], app.config['JOB_BACKOFF_CAP'], app.config['JOB_LEASE'])
+
+class AudioBlob(db.Model):
+    __tablename__ = "audio_blobs"
+    content_hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    @staticmethod
+    def retain(content_hash, size, source=None, count=1):
+        ref_count = db.session.execute(
+            db.update(AudioBlob).where(AudioBlob.content_hash == content_hash)
+            .values(ref_count=AudioBlob.ref_count + count).returning(AudioBlob.ref_count)
+        ).scalar()
+        if ref_count is None:
+            db.session.add(AudioBlob(content_hash=content_hash, size=size, ref_count=count))
+        if source is not None and (ref_count is None or ref_count <= count):
+            storage.put(content_hash, source)
+    @staticmethod
+    def release(content_hash):
+        if content_hash is None:
+            return None
+        ref_count = db.session.execute(
+            db.update(AudioBlob).where(AudioBlob.content_hash == content_hash)
+            .values(ref_count=AudioBlob.ref_count - 1).returning(AudioBlob.ref_count)
+        ).scalar()
+        return content_hash if ref_count is not None and ref_count <= 0 else None
+
+def hash_stream(stream):
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(BULK_UPLOAD_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+class CreatorStats(db.Model):
+    __tablename__ = "creator_stats"
+    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    song_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    album_count = db.Column(db.Integer, nullable=False, default=0)
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+    @staticmethod
+    def refresh(creator_id):
+        album_count = db.session.query(db.func.count(Album.id)).filter(Album.creator_id == creator_id).scalar_subquery()
+        song_count, rating_count, rating_sum, album_count = (
+            db.session.query(
+                db.func.count(db.distinct(Song.id)),
+                db.func.count(Rating.id),
+                db.func.coalesce(db.func.sum(Rating.rating), 0),
+                album_count,
+            )
+            .select_from(Song)
+            .outerjoin(Rating, Rating.song_id == Song.id)
+            .filter(Song.user_id == creator_id)
+            .one()
+        )
+        return db.session.merge(CreatorStats(creator_id=creator_id, song_count=song_count, rating_count=rating_count,
+                                             rating_sum=rating_sum, album_count=album_count))
+    @staticmethod
+    def bump(creator_id, **deltas):
+        updated = CreatorStats.query.filter_by(creator_id=creator_id).update(
+            {getattr(CreatorStats, field): getattr(CreatorStats, field) + delta for field, delta in deltas.items()},
+            synchronize_session=False,
+        )
+        if not updated:
+            CreatorStats.refresh(creator_id)
+
+SONG_SEARCH_SOURCE = (
+    "SELECT s.id, s.title, s.singer, s.artist, s.genre, "
+    "trim(coalesce(s.album, '') || ' ' || coalesce((SELECT group_concat(a.name, ' ') FROM albums a "
+    "JOIN album_song_association asa ON asa.album_id = a.id WHERE asa.song_id = s.id), '')), "
+    "(SELECT lyrics_text(l.body, l.encoding) FROM song_lyrics l WHERE l.song_id = s.id) "
+    "FROM songs s"
+)
+ALBUM_SEARCH_SOURCE = "SELECT a.id, a.name, u.username FROM albums a LEFT JOIN users u ON u.id = a.creator_id"
+
+def fts_enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+def create_search_index():
+    if not fts_enabled():
+        return
+    db.session.execute(db.text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS song_search USING fts5("
+        "title, singer, artist, genre, album, lyrics, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    db.session.execute(db.text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS album_search USING fts5("
+        "name, creator, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ))
+    indexed = db.session.execute(db.text("SELECT count(*) FROM song_search")).scalar()
+    if indexed != Song.get_total_tracks_count():
+        rebuild_search_index()
+    db.session.commit()
+
+def rebuild_search_index():
+    if not fts_enabled():
+        return
+    db.session.execute(db.text("DELETE FROM song_search"))
+    db.session.execute(db.text(f"INSERT INTO song_search(rowid, title, singer, artist, genre, album, lyrics) {SONG_SEARCH_SOURCE}"))
+    db.session.execute(db.text("DELETE FROM album_search"))
+    db.session.execute(db.text(f"INSERT INTO album_search(rowid, name, creator) {ALBUM_SEARCH_SOURCE}"))
+
+def index_songs(song_ids):
+    if not song_ids or not fts_enabled():
+        return
+    params = {'ids': list(song_ids)}
+    db.session.execute(db.text("DELETE FROM song_search WHERE rowid IN :ids").bindparams(db.bindparam('ids', expanding=True)), params)
+    db.session.execute(db.text(
+        f"INSERT INTO song_search(rowid, title, singer, artist, genre, album, lyrics) {SONG_SEARCH_SOURCE} WHERE s.id IN :ids"
+    ).bindparams(db.bindparam('ids', expanding=True)), params)
+
+def unindex_song(song_id):
+    if not fts_enabled():
+        return
+    db.session.execute(db.text("DELETE FROM song_search WHERE rowid = :id"), {'id': song_id})
+
+def index_album(album_id):
+    if not fts_enabled():
+        return
+    db.session.execute(db.text("DELETE FROM album_search WHERE rowid = :id"), {'id': album_id})
+    db.session.execute(db.text(
+        f"INSERT INTO album_search(rowid, name, creator) {ALBUM_SEARCH_SOURCE} WHERE a.id = :id"
+    ), {'id': album_id})
+
+def build_match_expression(query):
+    terms = re.findall(r'\w+', query.lower())
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+def term_filter(query, *columns):
+    return db.and_(*[db.or_(*[column.ilike(f'%{term}%') for column in columns]) for term in re.findall(r'\w+', query.lower())])
+
+def search_song_ids(query, limit, offset=0):
+    match = build_match_expression(query)
+    if not match:
+        return []
+    if not fts_enabled():
+        return db.session.execute(
+            db.select(Song.id).where(term_filter(query, Song.title, Song.singer, Song.artist, Song.genre, Song.album))
+            .order_by(Song.created_at.desc(), Song.id.desc()).limit(limit).offset(offset)
+        ).scalars().all()
+    return db.session.execute(db.text(
+        "SELECT rowid FROM song_search WHERE song_search MATCH :match "
+        "ORDER BY bm25(song_search, 10.0, 4.0, 4.0, 2.0, 3.0, 1.0) LIMIT :limit OFFSET :offset"
+    ).columns(db.column('rowid', db.Integer)), {'match': match, 'limit': limit, 'offset': offset}).scalars().all()
+
+def search_songs(query, page=1, per_page=SEARCH_PAGE_SIZE):
+    song_ids = search_song_ids(query, per_page + 1, (page - 1) * per_page)
+    has_next = len(song_ids) > per_page
+    song_ids = song_ids[:per_page]
+    songs = {song.id: song for song in Song.query.filter(Song.id.in_(song_ids))}
+    return [songs[song_id] for song_id in song_ids if song_id in songs], has_next
+
+def search_albums(query, limit=SEARCH_SUGGEST_LIMIT):
+    match = build_match_expression(query)
+    if not match:
+        return []
+    if fts_enabled():
+        album_ids = db.session.execute(db.text(
+            "SELECT rowid FROM album_search WHERE album_search MATCH :match ORDER BY bm25(album_search, 5.0, 1.0) LIMIT :limit"
+        ).columns(db.column('rowid', db.Integer)), {'match': match, 'limit': limit}).scalars().all()
+    else:
+        album_ids = db.session.execute(
+            db.select(Album.id).where(term_filter(query, Album.name)).order_by(Album.id.desc()).limit(limit)
+        ).scalars().all()
+    albums = {album.id: album for album in Album.query.filter(Album.id.in_(album_ids))}
+    return [albums[album_id] for album_id in album_ids if album_id in albums]
+
+def encode_cursor(song):
+    return f"{(song.created_at or CURSOR_FLOOR).isoformat()}_{song.id}"
+
+def decode_cursor(cursor):
+    try:
+        created_at, song_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(song_id)
+    except ValueError:
+        abort(400)
+
+def paginate_songs(query, cursor=None, per_page=CATALOG_PAGE_SIZE):
+    if cursor:
+        query = query.filter(db.tuple_(Song.created_at, Song.id) < decode_cursor(cursor))
+    songs = query.order_by(Song.created_at.desc(), Song.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_cursor(songs[per_page - 1]) if len(songs) > per_page else None
+    return songs[:per_page], next_cursor
+
+def upsert(model):
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
+
+class StatsRollup(db.Model):
+    __tablename__ = "stats_rollup"
+    metric = db.Column(db.String(40), primary_key=True)
+    bucket = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    @staticmethod
+    def bump(metric, bucket, delta=1):
+        if bucket is None:
+            return
+        db.session.execute(
+            upsert(StatsRollup).values(metric=metric, bucket=str(bucket), count=delta)
+            .on_conflict_do_update(index_elements=['metric', 'bucket'], set_={'count': StatsRollup.count + delta})
+        )
+    @staticmethod
+    def rebuild():
+        StatsRollup.query.delete()
+        rows = [('albums', 'all', Song.get_total_albums_count())]
+        rows += [('genre', genre, count) for genre, count in Song.get_song_count_by_genre()]
+        rows += db.session.query(db.literal('user_type'), User.user_type, db.func.count(User.id)).group_by(User.user_type).all()
+        uploaded_on = db.func.date(Song.created_at)
+        rows += db.session.query(db.literal('uploads_per_day'), uploaded_on, db.func.count(Song.id)).group_by(uploaded_on).all()
+        rated_on = db.func.date(Rating.created_at)
+        rows += db.session.query(db.literal('ratings_per_day'), rated_on, db.func.count(Rating.id)).group_by(rated_on).all()
+        db.session.execute(db.insert(StatsRollup), [
+            {'metric': metric, 'bucket': str(bucket), 'count': count} for metric, bucket, count in rows if bucket is not None
+        ])
+    @staticmethod
+    def snapshot():
+        snapshot = {}
+        for row in StatsRollup.query.filter(StatsRollup.count != 0):
+            snapshot.setdefault(row.metric, {})[row.bucket] = row.count
+        return snapshot
+
+def reconcile_song_ratings():
+    totals = (
+        db.session.query(Rating.song_id, db.func.count(Rating.id).label('count'), db.func.sum(Rating.rating).label('total'))
+        .group_by(Rating.song_id)
+        .subquery()
+    )
+    db.session.execute(db.update(Song).values(rating_count=0, rating_sum=0, rating=0.0))
+    db.session.execute(
+        db.update(Song)
+        .where(Song.id == totals.c.song_id)
+        .values(rating_count=totals.c.count, rating_sum=totals.c.total, rating=totals.c.total * 1.0 / totals.c.count)
+    )
+    CreatorStats.query.delete()
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migrations"
+    version = db.Column(db.Integer, primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def add_rating_aggregates(inspector):
+    if 'created_at' not in {column['name'] for column in inspector.get_columns('rating')}:
+        db.session.execute(db.text("ALTER TABLE rating ADD COLUMN created_at DATETIME"))
+    if 'rating_count' not in {column['name'] for column in inspector.get_columns('songs')}:
+        db.session.execute(db.text("ALTER TABLE songs ADD COLUMN rating_count INTEGER NOT NULL DEFAULT 0"))
+        db.session.execute(db.text("ALTER TABLE songs ADD COLUMN rating_sum INTEGER NOT NULL DEFAULT 0"))
+        reconcile_song_ratings()
+    rating_uniques = [unique['column_names'] for unique in inspector.get_unique_constraints('rating')]
+    rating_uniques += [index['column_names'] for index in inspector.get_indexes('rating') if index['unique']]
+    if ['user_id', 'song_id'] not in rating_uniques:
+        db.session.execute(db.text("DELETE FROM rating WHERE id NOT IN (SELECT min(id) FROM rating GROUP BY user_id, song_id)"))
+        db.session.execute(db.text("CREATE UNIQUE INDEX uq_rating_user_song ON rating (user_id, song_id)"))
+        reconcile_song_ratings()
+
+def create_indexes(*names):
+    indexes = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        indexes[name].create(db.session.connection(), checkfirst=True)
+
+def add_lookup_indexes(inspector):
+    connection = db.session.connection()
+    for table in (playlist_song_association, album_song_association):
+        if inspector.get_pk_constraint(table.name)['constrained_columns']:
+            continue
+        existing = [column['name'] for column in inspector.get_columns(table.name)]
+        columns = ', '.join(existing)
+        not_null = ' AND '.join(f"{name} IS NOT NULL" for name in existing)
+        db.session.execute(db.text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+        table.create(connection)
+        db.session.execute(db.text(
+            f"INSERT INTO {table.name} ({columns}) SELECT DISTINCT {columns} FROM {table.name}_old WHERE {not_null}"
+        ))
+        db.session.execute(db.text(f"DROP TABLE {table.name}_old"))
+    create_indexes('ix_songs_created_at_id', 'ix_songs_user_id_created_at_id', 'ix_songs_genre',
+                   'ix_rating_song_id_created_at', 'ix_playlists_user_id', 'ix_albums_creator_id')
+
+def add_audio_metadata(inspector):
+    columns = {column['name'] for column in inspector.get_columns('songs')}
+    for name, column_type in (('content_hash', 'VARCHAR(64)'), ('duration', 'FLOAT'), ('bitrate', 'INTEGER')):
+        if name not in columns:
+            db.session.execute(db.text(f"ALTER TABLE songs ADD COLUMN {name} {column_type}"))
+    create_indexes('ix_songs_content_hash')
+
+def move_audio_to_content_store(inspector):
+    root = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+    stored = {}
+    for song_id, filename in db.session.query(Song.id, Song.filename).filter(Song.filename.isnot(None)).all():
+        if filename not in stored:
+            legacy_path = safe_join(root, filename)
+            if legacy_path is None or not os.path.isfile(legacy_path):
+                app.logger.warning("Audio file for song %s is missing: %s", song_id, filename)
+                continue
+            with open(legacy_path, 'rb') as f:
+                content_hash, size = hash_stream(f)
+                storage.put(content_hash, f)
+            stored[filename] = (content_hash, size)
+        content_hash, size = stored[filename]
+        db.session.execute(db.update(Song).where(Song.id == song_id).values(content_hash=content_hash))
+        AudioBlob.retain(content_hash, size)
+        db.session.flush()
+
+def add_hls_flag(inspector):
+    if 'hls_ready' not in {column['name'] for column in inspector.get_columns('songs')}:
+        db.session.execute(db.text("ALTER TABLE songs ADD COLUMN hls_ready BOOLEAN NOT NULL DEFAULT 0"))
+
+def add_audio_analysis(inspector):
+    columns = {column['name'] for column in inspector.get_columns('songs')}
+    for name, column_type in (('loudness', 'FLOAT'), ('replay_gain', 'FLOAT'), ('peaks', 'BLOB')):
+        if name not in columns:
+            db.session.execute(db.text(f"ALTER TABLE songs ADD COLUMN {name} {column_type}"))
+
+def add_track_positions(inspector):
+    for table, owner_column in ((playlist_song_association, 'playlist_id'), (album_song_association, 'album_id')):
+        if 'position' not in {column['name'] for column in inspector.get_columns(table.name)}:
+            db.session.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN position INTEGER NOT NULL DEFAULT 0"))
+        db.session.execute(db.text(
+            f"UPDATE {table.name} SET position = ranked.position FROM ("
+            f"SELECT {owner_column}, song_id, row_number() OVER (PARTITION BY {owner_column} ORDER BY song_id) - 1 AS position "
+            f"FROM {table.name}) AS ranked "
+            f"WHERE ranked.{owner_column} = {table.name}.{owner_column} AND ranked.song_id = {table.name}.song_id"
+        ))
+
+def move_lyrics_to_song_lyrics(inspector):
+    if 'lyrics' not in {column['name'] for column in inspector.get_columns('songs')}:
+        return
+    rows = db.session.execute(db.text("SELECT id, lyrics FROM songs WHERE lyrics IS NOT NULL AND trim(lyrics) != ''"))
+    for chunk in iter(lambda: rows.fetchmany(1000), []):
+        db.session.execute(db.insert(SongLyrics), [SongLyrics.row(song_id, text) for song_id, text in chunk])
+    db.session.execute(db.text("UPDATE songs SET lyrics = NULL"))
+    if 'song_search' in inspector.get_table_names():
+        rebuild_search_index()
+
+def backfill_song_created_at(inspector):
+    missing = db.session.query(db.func.count(Song.id)).filter(Song.created_at.is_(None)).scalar()
+    if not missing:
+        return
+    oldest = db.session.query(db.func.min(Song.created_at)).scalar() or datetime.utcnow()
+    db.session.execute(db.update(Song).where(Song.created_at.is_(None)).values(created_at=oldest))
+    StatsRollup.bump('uploads_per_day', oldest.date().isoformat(), missing)
+
+def add_audio_features(inspector):
+    if 'features' not in {column['name'] for column in inspector.get_columns('songs')}:
+        db.session.execute(db.text("ALTER TABLE songs ADD COLUMN features BLOB"))
+
+MIGRATIONS = [
+    add_rating_aggregates,
+    add_lookup_indexes,
+    add_audio_metadata,
+    move_audio_to_content_store,
+    add_hls_flag,
+    add_audio_analysis,
+    add_track_positions,
+    move_lyrics_to_song_lyrics,
+    add_audio_features,
+    backfill_song_created_at,
+]
+
+def upgrade_schema():
+    applied = set(db.session.execute(db.select(SchemaMigration.version)).scalars())
+    for version, migration in enumerate(MIGRATIONS, 1):
+        if version in applied:
+            continue
+        migration(db.inspect(db.session.connection()))
+        db.session.add(SchemaMigration(version=version))
+        db.session.commit()
+        app.logger.info("Applied schema migration %s (%s)", version, migration.__name__)
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    create_tables()
+    click.echo(f"Database schema is at version {len(MIGRATIONS)}.")
+
+@app.cli.command('remove-legacy-audio')
+def remove_legacy_audio_command():
+    root = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
+    removed = 0
+    for filename, content_hash in db.session.query(Song.filename, Song.content_hash).filter(Song.content_hash.isnot(None)).distinct():
+        legacy_path = safe_join(root, filename) if filename else None
+        if legacy_path is None or not os.path.isfile(legacy_path) or not storage.exists(content_hash):
+            continue
+        if os.path.abspath(legacy_path) == os.path.abspath(storage.local_path(content_hash) or ''):
+            continue
+        with open(legacy_path, 'rb') as f:
+            if hash_stream(f)[0] != content_hash:
+                continue
+        os.remove(legacy_path)
+        removed += 1
+    click.echo(f"Removed {removed} legacy audio files already held in the content store.")
+
+@app.cli.command('reconcile-ratings')
+def reconcile_ratings_command():
+    reconcile_song_ratings()
+    db.session.commit()
+    click.echo("Song rating aggregates recomputed from ratings.")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    StatsRollup.rebuild()
+    db.session.commit()
+    click.echo("Admin statistics rollup rebuilt.")
+
+@app.cli.command('rebuild-recommendations')
+def rebuild_recommendations_command():
+    songs, users = rebuild_recommendations()
+    click.echo(f"Similarity computed for {songs} songs; recommendations stored for {users} users.")
+
+@app.cli.command('rebuild-similarity-index')
+def rebuild_similarity_index_command():
+    songs = rebuild_similarity_index()
+    click.echo(f"Similarity index rebuilt from {songs} analysed songs.")
+
+@app.cli.command('rebuild-charts')
+def rebuild_charts_command():
+    play_events.flush()
+    charts, songs = rebuild_charts()
+    click.echo(f"Rebuilt {charts} charts from {songs} songs played in the last {app.config['CHART_WINDOW_HOURS']} hours.")
+
 def create_tables():
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        create_search_index()
         admin_username = "admin"
         admin_password = "admin"
         admin_user = User.query.filter_by(username=admin_username, user_type='admin').first()
@@ -148,6 +857,164 @@ def create_tables():
             admin_user.set_password(admin_password)
             db.session.add(admin_user)
             db.session.commit()
+        if not StatsRollup.query.first():
+            StatsRollup.rebuild()
+            db.session.commit()
+
+def song_snapshot(song):
+    snapshot = {
+        'id': song.id,
+        'title': song.title,
+        'singer': song.singer,
+        'artist': song.artist,
+        'genre': song.genre,
+        'release_date': song.release_date,
+        'average_rating': song.average_rating,
+        'hls_ready': song.hls_ready,
+        'replay_gain': song.replay_gain,
+    }
+    return snapshot
+
+def song_cache_tags(song_id):
+    album_ids = db.session.query(album_song_association.c.album_id).filter(album_song_association.c.song_id == song_id)
+    playlist_ids = db.session.query(playlist_song_association.c.playlist_id).filter(playlist_song_association.c.song_id == song_id)
+    return ([('song', song_id), ('catalog', 'all')]
+            + [('album', album_id) for album_id, in album_ids]
+            + [('playlist', playlist_id) for playlist_id, in playlist_ids])
+
+def parse_song_ids(values):
+    try:
+        return list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        return None
+
+def existing_song_ids(song_ids, user_id=None):
+    if not song_ids:
+        return []
+    query = db.select(Song.id).where(Song.id.in_(song_ids))
+    if user_id is not None:
+        query = query.where(Song.user_id == user_id)
+    found = set(db.session.scalars(query))
+    return [song_id for song_id in song_ids if song_id in found]
+
+def track_positions(table, owner_column, owner_id):
+    rows = db.session.execute(
+        db.select(table.c.song_id, table.c.position)
+        .where(table.c[owner_column] == owner_id)
+        .order_by(table.c.position, table.c.song_id)
+    )
+    return {song_id: position for song_id, position in rows}
+
+def write_track_order(table, owner_column, owner_id, current, song_ids):
+    keep = set(song_ids)
+    removed = [song_id for song_id in current if song_id not in keep]
+    if removed:
+        db.session.execute(db.delete(table).where(table.c[owner_column] == owner_id, table.c.song_id.in_(removed)))
+    added = [{owner_column: owner_id, 'song_id': song_id, 'position': position}
+             for position, song_id in enumerate(song_ids) if song_id not in current]
+    if added:
+        db.session.execute(db.insert(table), added)
+    moved = [{'moved_song_id': song_id, 'new_position': position}
+             for position, song_id in enumerate(song_ids) if song_id in current and current[song_id] != position]
+    if moved:
+        db.session.execute(
+            db.update(table)
+            .where(table.c[owner_column] == owner_id, table.c.song_id == db.bindparam('moved_song_id'))
+            .values(position=db.bindparam('new_position')),
+            moved,
+        )
+
+def append_tracks(table, owner_column, owner_id, song_ids):
+    start = db.session.scalar(
+        db.select(db.func.coalesce(db.func.max(table.c.position) + 1, 0)).where(table.c[owner_column] == owner_id)
+    )
+    if song_ids:
+        db.session.execute(db.insert(table), [{owner_column: owner_id, 'song_id': song_id, 'position': start + index}
+                                               for index, song_id in enumerate(song_ids)])
+
+def load_recommended_tracks(user_id):
+    songs = (
+        Song.query.join(UserRecommendation, UserRecommendation.song_id == Song.id)
+        .filter(UserRecommendation.user_id == user_id)
+        .order_by(UserRecommendation.rank)
+        .limit(3)
+        .all()
+    )
+    if len(songs) < 3:
+        rated = db.select(Rating.song_id).where(Rating.user_id == user_id)
+        newest = Song.query.filter(Song.id.notin_([song.id for song in songs]), Song.id.notin_(rated)).order_by(Song.created_at.desc())
+        songs += newest.limit(3 - len(songs)).all()
+    return [song_snapshot(song) for song in songs]
+
+def render_recommended_albums(user_id):
+    score = db.func.sum(UserRecommendation.score)
+    albums = (
+        Album.query.options(db.selectinload(Album.creator))
+        .join(album_song_association, album_song_association.c.album_id == Album.id)
+        .join(UserRecommendation, UserRecommendation.song_id == album_song_association.c.song_id)
+        .filter(UserRecommendation.user_id == user_id)
+        .group_by(Album.id)
+        .order_by(score.desc(), Album.id.desc())
+        .limit(3)
+        .all()
+    )
+    if len(albums) < 3:
+        newest = Album.query.options(db.joinedload(Album.creator)).filter(Album.id.notin_([album.id for album in albums]))
+        albums += newest.order_by(Album.id.desc()).limit(3 - len(albums)).all()
+    return Markup(render_template('recommended_albums.html', recommended_albums=albums))
+
+def load_charts():
+    rows = (
+        db.session.query(ChartEntry.chart, ChartEntry.plays, Song.id, Song.title, Song.artist)
+        .join(Song, Song.id == ChartEntry.song_id)
+        .order_by(ChartEntry.chart, ChartEntry.rank)
+    )
+    charts = {}
+    for chart, plays, song_id, title, artist in rows:
+        charts.setdefault(chart, []).append({'id': song_id, 'title': title, 'artist': artist, 'plays': plays})
+    return charts
+
+def trending_charts():
+    return cache.memoize(cache.key('charts', ('charts', 'all')), load_charts)
+
+def load_album(album_id):
+    album = Album.query.get(album_id)
+    if not album:
+        return None
+    return {'id': album.id, 'name': album.name, 'creator': {'username': album.creator.username},
+            'songs': [song_snapshot(song) for song in album.songs]}
+
+def load_playlist(playlist_id):
+    playlist = Playlist.query.get(playlist_id)
+    if not playlist:
+        return None
+    return {'id': playlist.id, 'name': playlist.name, 'user_id': playlist.user_id,
+            'songs': [song_snapshot(song) for song in playlist.songs]}
+
+def load_song(song_id):
+    song = Song.query.get(song_id)
+    return song_snapshot(song) if song else None
+
+def load_lyrics(song_id):
+    entry = db.session.get(SongLyrics, song_id)
+    if entry is None:
+        return None
+    lines, synced = parse_lrc(entry.text)
+    return {'song_id': song_id, 'synced': synced, 'lines': lines, 'digest': entry.digest}
+
+def song_lyrics(song_id):
+    return cache.memoize(cache.key('lyrics', ('song', song_id)), lambda: load_lyrics(song_id))
+
+def load_similar_songs(song_id):
+    neighbours = get_similarity_index().nearest(song_id, app.config['SIMILAR_SONGS'])
+    if not neighbours:
+        return []
+    rows = {row.id: row for row in db.session.query(Song.id, Song.title, Song.singer).filter(Song.id.in_([i for i, _ in neighbours]))}
+    return [{'id': i, 'title': rows[i].title, 'singer': rows[i].singer, 'score': round(score, 3)}
+            for i, score in neighbours if i in rows]
+
+def similar_songs(song_id):
+    return cache.memoize(cache.key('similar', ('song', song_id), ('catalog', 'all')), lambda: load_similar_songs(song_id))
 
 class ChangeAdminPasswordForm(FlaskForm):
     new_password = PasswordField('New Password', validators=[DataRequired(), Length(min=8)])
@@ -169,16 +1036,17 @@ def user_homepage():
         return redirect(url_for('login'))
     if current_user.user_type == 'admin':
         return redirect(url_for('admin_dashboard'))
-    recommended_tracks = (
-        db.session.query(Song)
-        .options(db.joinedload(Song.user_rating))
-        .order_by(Song.created_at.desc())
-        .limit(3)
-        .all()
+    tags = (('catalog', 'all'), ('recommendations', 'all'), ('recommendations', current_user.id))
+    recommended_tracks = cache.memoize(cache.key('homepage:tracks', *tags), lambda: load_recommended_tracks(current_user.id))
+    recommended_albums_html = cache.memoize(cache.key('homepage:albums', *tags), lambda: render_recommended_albums(current_user.id))
+    user_ratings = dict(
+        db.session.query(Rating.song_id, Rating.rating)
+        .filter(Rating.user_id == current_user.id, Rating.song_id.in_([song['id'] for song in recommended_tracks]))
     )
-    recommended_albums = Album.query.order_by(Album.id.desc()).limit(3).all()
-    playlists = current_user.playlists
-    return render_template('user_homepage.html', recommended_tracks=recommended_tracks, recommended_albums=recommended_albums, playlists=playlists)
+    playlists = Playlist.query.filter_by(user_id=current_user.id).all()
+    trending = trending_charts().get('global', [])[:10]
+    return render_template('user_homepage.html', recommended_tracks=recommended_tracks, recommended_albums_html=recommended_albums_html,
+                           user_ratings=user_ratings, playlists=playlists, trending=trending)
 
 @app.route('/creator')
 @login_required
@@ -189,42 +1057,37 @@ def creator_homepage():
 
 @app.route('/song/<int:song_id>')
 def song_details(song_id):
-    song = Song.query.get(song_id)
+    song = cache.memoize(cache.key('song', ('song', song_id)), lambda: load_song(song_id))
     if song:
-        ratings = Rating.query.filter_by(song_id=song.id).all()
-        total_ratings = len(ratings)
-        average_rating = 0 if total_ratings == 0 else sum(rating.rating for rating in ratings) / total_ratings
-        return render_template('song_details.html', song=song, ratings=ratings, average_rating=average_rating)
+        return render_template('song_details.html', song=song, average_rating=song['average_rating'], similar=similar_songs(song_id))
     else:
         abort(404)
 
 @app.route('/create_playlist', methods=['GET', 'POST'])
 @login_required
 def create_playlist():
-  songs = Song.query.all()
+  songs, next_cursor = paginate_songs(Song.query)
   if request.method == 'POST':
     playlist_name = request.form.get('playlist_name')
     if not playlist_name:
-      return render_template('create_playlist.html', error="Playlist name is required.", songs=songs)
-    selected_song_ids = request.form.getlist('selected_songs')
+      return render_template('create_playlist.html', error="Playlist name is required.", songs=songs, next_cursor=next_cursor)
+    selected_song_ids = existing_song_ids(parse_song_ids(request.form.getlist('selected_songs')) or [])
     if len(selected_song_ids) == 0:
-      return render_template('create_playlist.html', error="Please select at least one song for the playlist.", songs=songs)
+      return render_template('create_playlist.html', error="Please select at least one song for the playlist.", songs=songs, next_cursor=next_cursor)
     playlist = Playlist(name=playlist_name, user_id=current_user.id)
-    for song_id in selected_song_ids:
-      song = Song.query.get(song_id)
-      playlist.associated_songs.append(song)
     db.session.add(playlist)
+    db.session.flush()
+    append_tracks(playlist_song_association, 'playlist_id', playlist.id, selected_song_ids)
     db.session.commit()
     return redirect(url_for('user_homepage'))
-  return render_template('create_playlist.html', songs=songs)
+  return render_template('create_playlist.html', songs=songs, next_cursor=next_cursor)
 
 @app.route('/show_playlist/<int:playlist_id>')
 def show_playlist(playlist_id):
-    playlist = Playlist.query.get(playlist_id)
+    playlist = cache.memoize(cache.key('playlist', ('playlist', playlist_id)), lambda: load_playlist(playlist_id))
     if not playlist:
         abort(404)
-    songs = playlist.songs
-    return render_template('show_playlist.html', playlist=playlist, songs=songs)
+    return render_template('show_playlist.html', playlist=playlist, songs=playlist['songs'])
 
 @app.route('/edit_playlist/<int:playlist_id>', methods=['GET', 'POST'])
 @login_required
@@ -240,14 +1103,59 @@ def edit_playlist(playlist_id):
             return render_template('edit_playlist.html', error="Playlist name is required.")
         playlist.name = new_playlist_name
         db.session.commit()
+        cache.invalidate(('playlist', playlist.id))
         return redirect(url_for('show_playlist', playlist_id=playlist.id))
     return render_template('edit_playlist.html', playlist=playlist)
 
+@app.route('/api/playlists/<int:playlist_id>/tracks', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@login_required
+def api_playlist_tracks(playlist_id):
+    playlist = db.session.get(Playlist, playlist_id)
+    if not playlist:
+        abort(404)
+    current = track_positions(playlist_song_association, 'playlist_id', playlist.id)
+    if request.method == 'GET':
+        return jsonify(playlist_id=playlist.id, song_ids=list(current))
+    if playlist.user_id != current_user.id:
+        abort(403)
+    payload = request.get_json(silent=True) or {}
+    song_ids = parse_song_ids(payload.get('song_ids') or []) if isinstance(payload.get('song_ids', []), list) else None
+    if song_ids is None:
+        abort(400)
+    order = list(current)
+    if request.method == 'POST':
+        new_ids = [song_id for song_id in existing_song_ids(song_ids) if song_id not in current]
+        position = payload.get('position', len(order))
+        if not isinstance(position, int) or not 0 <= position <= len(order):
+            abort(400)
+        order[position:position] = new_ids
+    elif request.method == 'PUT':
+        if sorted(song_ids) != sorted(order):
+            abort(400)
+        order = song_ids
+    else:
+        removed = set(song_ids)
+        order = [song_id for song_id in order if song_id not in removed]
+    write_track_order(playlist_song_association, 'playlist_id', playlist.id, current, order)
+    db.session.commit()
+    cache.invalidate(('playlist', playlist.id))
+    return jsonify(playlist_id=playlist.id, song_ids=order)
+
 @app.route('/search_results', methods=['GET'])
 def search_results():
     query = request.args.get('query', '')
-    matching_songs = Song.query.filter(Song.title.ilike(f'%{query}%')).all()
-    return render_template('search_results.html', matching_songs=matching_songs)
+    page = max(request.args.get('page', 1, type=int), 1)
+    matching_songs, has_next = search_songs(query, page)
+    matching_albums = search_albums(query) if page == 1 else []
+    return render_template('search_results.html', query=query, page=page, has_next=has_next,
+                           matching_songs=matching_songs, matching_albums=matching_albums)
+
+@app.route('/search_suggest', methods=['GET'])
+def search_suggest():
+    song_ids = search_song_ids(request.args.get('query', ''), SEARCH_SUGGEST_LIMIT)
+    rows = {row.id: row for row in db.session.query(Song.id, Song.title, Song.artist).filter(Song.id.in_(song_ids))}
+    return jsonify(suggestions=[{'id': song_id, 'title': rows[song_id].title, 'artist': rows[song_id].artist}
+                                for song_id in song_ids if song_id in rows])
 
 @app.route('/add_lyrics/<int:song_id>', methods=['GET', 'POST'])
 def add_lyrics(song_id):
@@ -256,8 +1164,12 @@ def add_lyrics(song_id):
     song = Song.query.get(song_id)
     if request.method == 'POST':
         lyrics = request.form.get('lyrics')
-        song.lyrics = lyrics
+        SongLyrics.save(song.id, lyrics)
+        index_songs([song.id])
         db.session.commit()
+        cache.invalidate(('song', song.id))
+        flash("Lyrics added successfully!", 'success')
+        return redirect(url_for('manage_songs'))
     return render_template('add_lyrics.html', song=song)
 
 @app.route('/upload', methods=['GET', 'POST'])
@@ -272,12 +1184,13 @@ def upload():
             title, _ = os.path.splitext(os.path.basename(filename))
             if not title:
                 flash("Title is required.", 'danger')
-                return render_template('upload.html', songs=Song.query.all())
-            central_upload_folder = app.config['UPLOAD_FOLDER']
-            os.makedirs(central_upload_folder, exist_ok=True)
-            file_path = os.path.join(central_upload_folder, filename)
+                return render_template('upload.html')
+            if not allowed_file(filename):
+                flash("Only MP3 files can be uploaded.", 'danger')
+                return render_template('upload.html')
             try:
-                file.save(file_path)
+                content_hash, size = hash_stream(file.stream)
+                AudioBlob.retain(content_hash, size, file.stream)
                 title = request.form.get('title')
                 singer = request.form.get('singer')
                 release_date = datetime.strptime(request.form.get('release_date'), '%Y-%m-%d').date()
@@ -285,15 +1198,25 @@ def upload():
                 lyrics = request.form.get('lyrics')
                 artist = current_user.username
                 user_id = current_user.id
-                song = Song(filename=filename, title=title, singer=singer, release_date=release_date,
-                            genre=genre, artist=artist, user_id=user_id, lyrics=lyrics)
+                song = Song(filename=secure_filename(filename), title=title, singer=singer, release_date=release_date,
+                            genre=genre, artist=artist, user_id=user_id, content_hash=content_hash)
                 db.session.add(song)
+                db.session.flush()
+                SongLyrics.save(song.id, lyrics)
+                index_songs([song.id])
+                CreatorStats.bump(user_id, song_count=1)
+                StatsRollup.bump('genre', genre)
+                StatsRollup.bump('uploads_per_day', song.created_at.date().isoformat())
+                enqueue_transcodes([song])
+                enqueue_analysis([song])
                 db.session.commit()
+                cache.invalidate(('catalog', 'all'))
                 flash("Song successfully uploaded!", 'success')
                 return redirect(url_for('creator_homepage'))
             except Exception as e:
+                db.session.rollback()
                 flash(f"An error occurred: {str(e)}", 'danger')
-    return render_template('upload.html', songs=Song.query.all())
+    return render_template('upload.html')
 
 @app.route('/edit_song/<int:song_id>', methods=['GET', 'POST'])
 @login_required
@@ -307,12 +1230,18 @@ def edit_song(song_id):
         song.title = request.form.get('title')
         song.singer = request.form.get('singer')
         song.release_date = datetime.strptime(request.form.get('release_date'), '%Y-%m-%d').date()
-        song.genre = request.form.get('genre')
-        song.lyrics = request.form.get('lyrics')
+        genre = request.form.get('genre')
+        if genre != song.genre:
+            StatsRollup.bump('genre', song.genre, -1)
+            StatsRollup.bump('genre', genre)
+        song.genre = genre
+        SongLyrics.save(song.id, request.form.get('lyrics'))
+        index_songs([song.id])
         db.session.commit()
+        cache.invalidate(*song_cache_tags(song.id))
         flash("Song details successfully updated!", 'success')
         return redirect(url_for('creator_dashboard'))
-    return render_template('edit_song.html', song=song)
+    return render_template('edit_song.html', song=song, lyrics=SongLyrics.text_for(song.id))
 
 @app.route('/delete_song/<int:song_id>', methods=['POST'])
 @login_required
@@ -325,10 +1254,29 @@ def delete_song(song_id):
             song = Song.query.get(song_id)
             if song:
                 if current_user.user_type == "admin" or song.user_id == current_user.id:
-                    if os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], song.filename)):
-                        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], song.filename))
+                    released_blob = AudioBlob.release(song.content_hash)
+                    unindex_song(song.id)
+                    StatsRollup.bump('genre', song.genre, -1)
+                    StatsRollup.bump('uploads_per_day', song.created_at and song.created_at.date().isoformat(), -1)
+                    rated_on = db.func.date(Rating.created_at)
+                    for day, count in db.session.query(rated_on, db.func.count(Rating.id)).filter(Rating.song_id == song.id).group_by(rated_on):
+                        StatsRollup.bump('ratings_per_day', day, -count)
+                    cache_tags = song_cache_tags(song.id)
+                    SongSimilarity.query.filter(db.or_(SongSimilarity.song_id == song.id, SongSimilarity.similar_song_id == song.id)).delete()
+                    UserRecommendation.query.filter_by(song_id=song.id).delete()
+                    PlayEvent.query.filter_by(song_id=song.id).delete()
+                    SongLyrics.query.filter_by(song_id=song.id).delete()
+                    ChartEntry.query.filter_by(song_id=song.id).delete()
+                    TranscodeJob.query.filter_by(song_id=song.id).delete()
+                    if released_blob:
+                        job_queue.enqueue('delete_blob', {'content_hash': released_blob}, key=f"delete_blob:{released_blob}")
+                    creator_id, rating_count, rating_sum = song.user_id, song.rating_count, song.rating_sum
                     db.session.delete(song)
+                    db.session.flush()
+                    CreatorStats.bump(creator_id, song_count=-1, rating_count=-rating_count, rating_sum=-rating_sum)
                     db.session.commit()
+                    cache.invalidate(*cache_tags, ('charts', 'all'))
+                    get_similarity_index().remove(song_id)
                     return redirect(url_for('creator_dashboard'))
                 else:
                     raise Forbidden("You don't have permission to delete this song.")
@@ -341,17 +1289,497 @@ def delete_song(song_id):
 def manage_songs():
     if current_user.user_type != "creator":
         return redirect(url_for('index'))
-    songs = Song.query.filter_by(user_id=current_user.id).all()
-    return render_template('manage_songs.html', songs=songs)
+    songs, next_cursor = paginate_songs(Song.query.filter_by(user_id=current_user.id), request.args.get('cursor'))
+    return render_template('manage_songs.html', songs=songs, next_cursor=next_cursor)
 
 @app.route('/play')
 def play_all():
-    return render_template('play.html', songs=Song.query.all())
+    songs, next_cursor = paginate_songs(Song.query, request.args.get('cursor'))
+    return render_template('play.html', songs=songs, next_cursor=next_cursor)
+
+@app.route('/api/songs')
+def api_songs():
+    songs, next_cursor = paginate_songs(Song.query, request.args.get('cursor'))
+    return jsonify(
+        songs=[{
+            'id': song.id,
+            'title': song.title,
+            'singer': song.singer,
+            'artist': song.artist,
+            'genre': song.genre,
+            'details_url': url_for('song_details', song_id=song.id),
+            'stream_url': url_for('stream_song', song_id=song.id),
+        } for song in songs],
+        next_cursor=next_cursor,
+    )
+
+media_executor = None
+
+def get_media_executor():
+    global media_executor
+    if media_executor is None:
+        media_executor = ProcessPoolExecutor(max_workers=app.config['MEDIA_WORKERS'],
+                                             mp_context=multiprocessing.get_context('spawn'))
+    return media_executor
+
+similarity_index = None
+
+def get_similarity_index():
+    global similarity_index
+    if similarity_index is None:
+        from similarity import create_similarity_index
+        similarity_index = create_similarity_index(os.path.join(app.instance_path, app.config['SIMILARITY_INDEX_FOLDER']))
+    return similarity_index
+
+def rebuild_similarity_index():
+    from similarity import decode_features
+    rows = db.session.query(Song.id, Song.features).filter(Song.features.isnot(None)).order_by(Song.id).all()
+    songs = get_similarity_index().rebuild([song_id for song_id, _ in rows], [decode_features(blob) for _, blob in rows])
+    cache.invalidate(('catalog', 'all'))
+    return songs
+
+def index_song_features(song_ids, blob):
+    from similarity import decode_features
+    index = get_similarity_index()
+    for song_id in song_ids:
+        if not index.add(song_id, decode_features(blob)):
+            rebuild_similarity_index()
+            return
+
+def audio_source(content_hash):
+    return storage.local_path(content_hash) or storage.url(content_hash)
+
+def hls_dir(content_hash):
+    return os.path.join(app.root_path, app.config['HLS_FOLDER'], content_hash)
+
+def submit_transcode(song, ffmpeg):
+    job = TranscodeJob(song_id=song.id)
+    db.session.add(job)
+    db.session.flush()
+    job_id, source, target, bitrate = job.id, audio_source(song.content_hash), hls_dir(song.content_hash), song.bitrate
+    db.session.commit()
+    return job_id, get_media_executor().submit(transcode_to_hls, source, target, bitrate, ffmpeg)
+
+def finish_transcode(job_id, future):
+    with app.app_context():
+        job = db.session.get(TranscodeJob, job_id)
+        if job is None:
+            db.session.rollback()
+            return None
+        job.finished_at = datetime.utcnow()
+        try:
+            job.timings = json.dumps(future.result())
+            job.status = 'done'
+        except Exception as e:
+            app.logger.error("Transcode job %s failed: %s", job_id, e)
+            job.error = str(e)
+            job.status = 'failed'
+        content_hash = db.session.query(Song.content_hash).filter(Song.id == job.song_id).scalar()
+        if job.status == 'done' and content_hash:
+            song_ids = db.session.execute(
+                db.update(Song).where(Song.content_hash == content_hash).values(hls_ready=True).returning(Song.id)
+            ).scalars().all()
+        else:
+            song_ids = []
+        db.session.commit()
+        for song_id in song_ids:
+            cache.invalidate(*song_cache_tags(song_id))
+        return job
+
+def enqueue_transcodes(songs):
+    for song in songs:
+        if song.content_hash and not song.hls_ready:
+            job_queue.enqueue('transcode_hls', {'song_id': song.id}, key=f"transcode_hls:{song.id}", user_id=song.user_id)
+
+@job_queue.handler('transcode_hls', concurrency=app.config['MEDIA_WORKERS'])
+def transcode_hls_job(song_id):
+    ffmpeg = shutil.which(app.config['FFMPEG_BINARY'])
+    if not ffmpeg:
+        app.logger.warning("%s not found on PATH; skipping HLS transcoding", app.config['FFMPEG_BINARY'])
+        return {'skipped': 'ffmpeg not found'}
+    song = db.session.get(Song, song_id)
+    if song is None or song.hls_ready or not song.content_hash:
+        db.session.rollback()
+        return {'skipped': 'nothing to transcode'}
+    job_id, future = submit_transcode(song, ffmpeg)
+    finish_transcode(job_id, future)
+    transcode = db.session.get(TranscodeJob, job_id)
+    if transcode is None:
+        db.session.rollback()
+        return {'skipped': 'song was deleted'}
+    if transcode.status != 'done':
+        raise RuntimeError(transcode.error)
+    return {'transcode_job': job_id}
+
+@app.cli.command('transcode-all')
+def transcode_all_command():
+    ffmpeg = shutil.which(app.config['FFMPEG_BINARY'])
+    if not ffmpeg:
+        raise click.ClickException(f"{app.config['FFMPEG_BINARY']} not found on PATH.")
+    songs = Song.query.filter(Song.hls_ready.is_(False), Song.content_hash.isnot(None)).all()
+    submitted = [(song, *submit_transcode(song, ffmpeg)) for song in songs]
+    for song, job_id, future in submitted:
+        job = finish_transcode(job_id, future)
+        if job is None:
+            continue
+        click.echo(f"{song.id}\t{job.status}\t{job.timings or job.error}")
+
+def store_analysis(content_hash, result):
+    song_ids = db.session.execute(
+        db.update(Song).where(Song.content_hash == content_hash).values(**result).returning(Song.id)
+    ).scalars().all()
+    db.session.commit()
+    if result.get('features'):
+        index_song_features(song_ids, result['features'])
+    for song_id in song_ids:
+        cache.invalidate(*song_cache_tags(song_id))
+
+def finish_analysis(content_hash, future):
+    with app.app_context():
+        try:
+            result = future.result()
+        except Exception as e:
+            app.logger.error("Audio analysis for %s failed: %s", content_hash, e)
+            return None
+        store_analysis(content_hash, result)
+        return result
+
+def enqueue_analysis(songs):
+    for song in songs:
+        if song.content_hash:
+            job_queue.enqueue('analyze_audio', {'content_hash': song.content_hash}, key=f"analyze_audio:{song.content_hash}", user_id=song.user_id)
+
+@job_queue.handler('analyze_audio', concurrency=app.config['MEDIA_WORKERS'])
+def analyze_audio_job(content_hash):
+    from analysis import analyze_audio
+    ffmpeg = shutil.which(app.config['FFMPEG_BINARY'])
+    if not ffmpeg:
+        app.logger.warning("%s not found on PATH; skipping audio analysis", app.config['FFMPEG_BINARY'])
+        return {'skipped': 'ffmpeg not found'}
+    result = analyze_audio(audio_source(content_hash), ffmpeg)
+    store_analysis(content_hash, result)
+    return {'loudness': result['loudness'], 'replay_gain': result['replay_gain']}
+
+@job_queue.handler('delete_blob', concurrency=2, priority=-10)
+def delete_blob_job(content_hash):
+    released = AudioBlob.query.filter(AudioBlob.content_hash == content_hash, AudioBlob.ref_count <= 0).delete()
+    if not released:
+        db.session.rollback()
+        return {'skipped': 'blob is referenced again'}
+    storage.delete(content_hash)
+    shutil.rmtree(hls_dir(content_hash), ignore_errors=True)
+    db.session.commit()
+    return None
+
+@job_queue.handler('refresh_recommendations', concurrency=2, priority=10)
+def refresh_recommendations_job(user_id):
+    refresh_user_recommendations(user_id)
+    db.session.commit()
+    cache.invalidate(('recommendations', user_id))
+    return None
+
+@app.cli.command('worker')
+@click.option('--threads', type=int, default=None, help='Worker threads (default JOB_WORKER_THREADS).')
+@click.option('--kind', 'kinds', multiple=True, help='Only run jobs of this kind; repeatable.')
+@click.option('--burst', is_flag=True, help='Exit once no job is ready to run.')
+def worker_command(threads, kinds, burst):
+    worker = Worker(app, job_queue, threads or app.config['JOB_WORKER_THREADS'], app.config['JOB_POLL_INTERVAL'], set(kinds) or None, burst)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    click.echo(f"Worker {worker.name} running {worker.threads} threads for: {', '.join(sorted(kinds or job_queue.types))}")
+    processed, failed = worker.run()
+    click.echo(f"Processed {processed} jobs ({failed} failed).")
+
+@app.cli.command('prune-jobs')
+@click.option('--days', type=int, default=None, help='Keep finished jobs this many days (default JOB_RETENTION_DAYS).')
+def prune_jobs_command(days):
+    removed = job_queue.prune(timedelta(days=days if days is not None else app.config['JOB_RETENTION_DAYS']))
+    click.echo(f"Removed {removed} finished jobs.")
+
+@app.cli.command('analyze-all')
+@click.option('--force', is_flag=True, help='Reanalyze songs that already have peaks and features.')
+def analyze_all_command(force):
+    from analysis import analyze_audio
+    ffmpeg = shutil.which(app.config['FFMPEG_BINARY'])
+    if not ffmpeg:
+        raise click.ClickException(f"{app.config['FFMPEG_BINARY']} not found on PATH.")
+    query = db.session.query(Song.content_hash).filter(Song.content_hash.isnot(None)).distinct()
+    if not force:
+        query = query.filter(db.or_(Song.replay_gain.is_(None), Song.features.is_(None)))
+    submitted = [(content_hash, get_media_executor().submit(analyze_audio, audio_source(content_hash), ffmpeg))
+                 for content_hash, in query.all()]
+    for content_hash, future in submitted:
+        result = finish_analysis(content_hash, future)
+        click.echo(f"{content_hash}\t{'failed' if result is None else result['loudness']}")
+
+@app.route('/song/<int:song_id>/peaks')
+def song_peaks(song_id):
+    from analysis import decode_peaks, PEAKS_PER_SECOND
+    row = db.session.query(Song.content_hash, Song.peaks, Song.loudness, Song.replay_gain).filter(Song.id == song_id).first()
+    if not row or row.peaks is None:
+        abort(404)
+    peaks = decode_peaks(row.peaks)
+    headers = {
+        'X-Peaks-Per-Second': str(PEAKS_PER_SECOND),
+        'X-Loudness-LUFS': str(row.loudness),
+        'X-Replay-Gain': str(row.replay_gain),
+    }
+    if request.args.get('format') == 'json':
+        response = jsonify(peaks=peaks.tolist(), peaks_per_second=PEAKS_PER_SECOND,
+                           loudness=row.loudness, replay_gain=row.replay_gain)
+        response.headers.extend(headers)
+        response.set_etag(f"{row.content_hash}.json")
+    else:
+        response = Response(peaks.tobytes(), mimetype='application/octet-stream', headers=headers)
+        response.set_etag(row.content_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['STREAM_MAX_AGE']
+    return response.make_conditional(request)
+
+@app.route('/stream/<int:song_id>/<path:filename>')
+def stream_hls(song_id, filename):
+    song = Song.query.get(song_id)
+    if not song or not song.hls_ready:
+        abort(404)
+    mimetype = 'video/mp2t' if filename.endswith('.ts') else 'application/vnd.apple.mpegurl'
+    return send_from_directory(hls_dir(song.content_hash), filename, mimetype=mimetype, max_age=app.config['STREAM_MAX_AGE'])
+
+metadata_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix='audio-metadata')
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def iter_uploaded_audio(files):
+    for file in files:
+        name = file.filename or ''
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for member in archive.infolist():
+                    if not member.is_dir() and allowed_file(member.filename):
+                        with archive.open(member) as source:
+                            yield os.path.basename(member.filename), source
+        elif allowed_file(name):
+            yield name, file.stream
+
+def stream_to_disk(source, folder):
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix='.part')
+    with os.fdopen(fd, 'wb') as target:
+        for chunk in iter(lambda: source.read(BULK_UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            target.write(chunk)
+    return temp_path, digest.hexdigest()
+
+def read_metadata_safely(path):
+    try:
+        metadata = read_metadata(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    return metadata if metadata.get('duration') else None
+
+@job_queue.handler('bulk_upload', concurrency=2, max_attempts=1)
+def ingest_bulk_upload(user_id, artist, staged, duplicates, skipped):
+    progress = bulk_upload_progress(staged, duplicates, skipped)
+    try:
+        existing = set(db.session.execute(
+            db.select(AudioBlob.content_hash).where(AudioBlob.content_hash.in_([content_hash for _, _, content_hash in staged]), AudioBlob.ref_count > 0)
+        ).scalars())
+        db.session.rollback()
+        fresh = []
+        for name, temp_path, content_hash in staged:
+            if content_hash in existing:
+                progress['duplicates'].append(name)
+                progress['processed'] += 1
+            else:
+                fresh.append((name, temp_path, content_hash))
+        job_queue.report(progress)
+        readable = []
+        for (name, temp_path, content_hash), metadata in zip(fresh, metadata_executor.map(read_metadata_safely, [path for _, path, _ in fresh])):
+            progress['processed'] += 1
+            if metadata is None:
+                progress['errors'].append(f"{name}: not a readable MP3 file")
+            else:
+                readable.append((name, temp_path, content_hash, metadata))
+            if progress['processed'] % BULK_UPLOAD_REPORT_EVERY == 0:
+                job_queue.report(progress)
+        songs = []
+        for name, temp_path, content_hash, metadata in readable:
+            AudioBlob.retain(content_hash, os.path.getsize(temp_path))
+            storage.put_file(content_hash, temp_path)
+            songs.append(Song(
+                filename=secure_filename(name) or f"{content_hash}.mp3",
+                title=metadata.get('title') or os.path.splitext(name)[0],
+                singer=metadata.get('singer'),
+                album=metadata.get('album'),
+                genre=metadata.get('genre') or 'Unknown',
+                release_date=date(metadata['year'], 1, 1) if metadata.get('year') else None,
+                duration=metadata.get('duration'),
+                bitrate=metadata.get('bitrate'),
+                content_hash=content_hash,
+                artist=artist,
+                user_id=user_id,
+            ))
+        db.session.add_all(songs)
+        db.session.flush()
+        index_songs([song.id for song in songs])
+        CreatorStats.bump(user_id, song_count=len(songs))
+        for song in songs:
+            StatsRollup.bump('genre', song.genre)
+            StatsRollup.bump('uploads_per_day', song.created_at.date().isoformat())
+        enqueue_transcodes(songs)
+        enqueue_analysis(songs)
+        db.session.commit()
+        cache.invalidate(('catalog', 'all'))
+        progress['created'] = [song.id for song in songs]
+        return progress
+    finally:
+        for _, temp_path, _ in staged:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def bulk_upload_progress(staged, duplicates, skipped):
+    return {'total': len(staged) + len(duplicates), 'processed': len(duplicates), 'created': [],
+            'duplicates': list(duplicates), 'skipped': list(skipped), 'errors': []}
+
+@app.route('/bulk_upload', methods=['GET', 'POST'])
+@login_required
+def bulk_upload():
+    if current_user.user_type != "creator":
+        return redirect(url_for('index'))
+    if request.method == 'POST':
+        os.makedirs(storage.staging_dir, exist_ok=True)
+        staged, duplicates, skipped, seen = [], [], [], set()
+        try:
+            for name, source in iter_uploaded_audio(request.files.getlist('files')):
+                if len(staged) >= BULK_UPLOAD_MAX_FILES:
+                    skipped.append(name)
+                    continue
+                temp_path, content_hash = stream_to_disk(source, storage.staging_dir)
+                if content_hash in seen:
+                    os.remove(temp_path)
+                    duplicates.append(name)
+                    continue
+                seen.add(content_hash)
+                staged.append((name, temp_path, content_hash))
+        except zipfile.BadZipFile:
+            for _, temp_path, _ in staged:
+                os.remove(temp_path)
+            flash("One of the ZIP archives could not be read.", 'danger')
+            return render_template('bulk_upload.html')
+        if not staged:
+            flash("Please select at least one new MP3 file or ZIP archive.", 'danger')
+            return render_template('bulk_upload.html')
+        if skipped:
+            flash(f"Only the first {BULK_UPLOAD_MAX_FILES} files are uploaded at once; {len(skipped)} files were skipped.", 'warning')
+        job = job_queue.enqueue('bulk_upload', {'user_id': current_user.id, 'artist': current_user.username, 'staged': staged,
+                                                'duplicates': duplicates, 'skipped': skipped}, user_id=current_user.id)
+        db.session.commit()
+        job_id = job.id
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(job_id=job_id, status_url=url_for('bulk_upload_status', job_id=job_id)), 202
+        return render_template('bulk_upload.html', job_id=job_id)
+    return render_template('bulk_upload.html')
+
+@app.route('/bulk_upload/<int:job_id>')
+@login_required
+def bulk_upload_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or job.kind != 'bulk_upload' or job.user_id != current_user.id:
+        abort(404)
+    if job.result:
+        progress = json.loads(job.result)
+    else:
+        payload = json.loads(job.payload)
+        progress = bulk_upload_progress(payload['staged'], payload['duplicates'], payload['skipped'])
+    if job.status == 'failed' and job.error:
+        progress['errors'].append(job.error)
+    return jsonify(job_id=job.id, status='processing' if job.status == 'running' else job.status, **progress)
+
+@app.route('/stream/<int:song_id>')
+def stream_song(song_id):
+    song = Song.query.get(song_id)
+    if not song or not song.content_hash:
+        abort(404)
+    path = storage.local_path(song.content_hash)
+    if path is None:
+        return redirect(storage.url(song.content_hash))
+    if not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    if app.config['STREAM_ACCEL_REDIRECT']:
+        response = Response(mimetype='audio/mpeg')
+        response.headers['X-Accel-Redirect'] = app.config['STREAM_ACCEL_REDIRECT'].rstrip('/') + '/' + quote(storage.relative_path(song.content_hash))
+        return response
+    if app.config['USE_X_SENDFILE']:
+        response = Response(mimetype='audio/mpeg')
+        response.headers['X-Sendfile'] = path
+        return response
+    data = wrap_file(request.environ, open(path, 'rb'), buffer_size=app.config['STREAM_CHUNK_SIZE'])
+    response = Response(data, mimetype='audio/mpeg', direct_passthrough=True)
+    response.content_length = stat.st_size
+    response.last_modified = int(stat.st_mtime)
+    response.set_etag(song.content_hash)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['STREAM_MAX_AGE']
+    return response.make_conditional(request.environ, accept_ranges=True, complete_length=stat.st_size)
+
+def deduplicate_plays(events):
+    window = timedelta(seconds=app.config['PLAY_EVENT_DEDUP_WINDOW'])
+    events = sorted(events, key=lambda event: event['played_at'])
+    played = db.func.max(PlayEvent.played_at)
+    last_played = {(user_id, song_id): played_at for user_id, song_id, played_at in db.session.execute(
+        db.select(PlayEvent.user_id, PlayEvent.song_id, played)
+        .where(PlayEvent.user_id.in_({event['user_id'] for event in events}), PlayEvent.played_at >= events[0]['played_at'] - window)
+        .group_by(PlayEvent.user_id, PlayEvent.song_id)
+    )}
+    kept = []
+    for event in events:
+        key = (event['user_id'], event['song_id'])
+        if key in last_played and event['played_at'] - last_played[key] < window:
+            continue
+        last_played[key] = event['played_at']
+        kept.append(event)
+    return kept
+
+def write_play_events(events):
+    with app.app_context():
+        try:
+            known = set(db.session.scalars(db.select(Song.id).where(Song.id.in_({event['song_id'] for event in events}))))
+            rows = deduplicate_plays([event for event in events if event['song_id'] in known])
+            if rows:
+                db.session.execute(db.insert(PlayEvent), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("Dropped %d play events", len(events))
+
+play_events = create_event_buffer(write_play_events, app.config['PLAY_EVENT_BUFFER_SIZE'],
+                                  app.config['PLAY_EVENT_BATCH_SIZE'], app.config['PLAY_EVENT_FLUSH_INTERVAL'])
+
+@app.route('/events/play', methods=['POST'])
+@login_required
+def record_play():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = request.form
+    if not isinstance(payload, dict):
+        abort(400)
+    song_id = payload.get('song_id')
+    if not str(song_id).isdigit():
+        abort(400)
+    if play_limiter.hit((current_user.id, int(song_id))):
+        play_events.add({
+            'song_id': int(song_id),
+            'user_id': current_user.id,
+            'played_at': datetime.utcnow(),
+        })
+    return '', 202
 
 @app.route('/add_to_playlist/<int:song_id>', methods=['GET', 'POST'])
 @login_required
 def add_to_playlist(song_id):
-    if current_user.user_type != "normal":
+    if current_user.user_type != "user":
         abort(403)
     song = Song.query.get(song_id)
     if not song:
@@ -364,19 +1792,37 @@ def add_to_playlist(song_id):
         if not playlist:
             flash('Playlist not found or you do not have permission to add to this playlist.', 'error')
             return redirect(url_for('user_homepage'))
-        playlist.songs.append(song)
+        already_added = db.session.query(
+            db.exists().where(playlist_song_association.c.playlist_id == playlist.id, playlist_song_association.c.song_id == song.id)
+        ).scalar()
+        if already_added:
+            flash('Song is already in this playlist.', 'info')
+            return redirect(url_for('show_playlist', playlist_id=playlist.id))
+        append_tracks(playlist_song_association, 'playlist_id', playlist.id, [song.id])
         db.session.commit()
+        cache.invalidate(('playlist', playlist.id))
         flash('Song successfully added to the playlist!', 'success')
         return redirect(url_for('show_playlist', playlist_id=playlist.id))
-    playlists = current_user.playlists
+    playlists = Playlist.query.filter_by(user_id=current_user.id).all()
     return render_template('add_to_playlist.html', song=song, playlists=playlists)
 
 @app.route('/read_lyrics/<int:song_id>')
 def read_lyrics(song_id):
-    song = Song.query.get(song_id)
+    song = cache.memoize(cache.key('song', ('song', song_id)), lambda: load_song(song_id))
     if not song:
         abort(404)
-    return render_template('read_lyrics.html', song=song)
+    return render_template('read_lyrics.html', song=song, lyrics=song_lyrics(song_id))
+
+@app.route('/lyrics/<int:song_id>')
+def lyrics_json(song_id):
+    lyrics = song_lyrics(song_id)
+    if lyrics is None:
+        abort(404)
+    response = jsonify(synced=lyrics['synced'], lines=lyrics['lines'])
+    response.set_etag(lyrics['digest'])
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/edit_lyrics/<int:song_id>', methods=['GET', 'POST'])
 @login_required
@@ -387,11 +1833,13 @@ def edit_lyrics(song_id):
         return redirect(url_for('manage_songs'))
     if request.method == 'POST':
         edited_lyrics = request.form.get('edited_lyrics')
-        song.lyrics = edited_lyrics
+        SongLyrics.save(song.id, edited_lyrics)
+        index_songs([song.id])
         db.session.commit()
+        cache.invalidate(('song', song.id))
         flash("Lyrics updated successfully!", 'success')
         return redirect(url_for('manage_songs'))
-    return render_template('edit_lyrics.html', song=song)
+    return render_template('edit_lyrics.html', song=song, lyrics=SongLyrics.text_for(song.id))
 
 @app.route('/make_album', methods=['GET', 'POST'])
 @login_required
@@ -400,48 +1848,69 @@ def make_album():
         return redirect(url_for('index'))
     if request.method == 'POST':
         album_name = request.form.get('album_name')
-        selected_song_ids = request.form.getlist('selected_songs[]')
+        selected_song_ids = existing_song_ids(parse_song_ids(request.form.getlist('selected_songs[]')) or [], current_user.id)
         if not album_name:
             flash("Album name is required.", 'danger')
             return render_template('make_album.html', songs=Song.query.filter_by(user_id=current_user.id).all())
         if not selected_song_ids:
             flash("Please select at least one song for the album.", 'danger')
             return render_template('make_album.html', songs=Song.query.filter_by(user_id=current_user.id).all())
-        album = Album(name=album_name, creator=current_user)
+        album = Album(name=album_name, creator_id=current_user.id)
         db.session.add(album)
-        for song_id in selected_song_ids:
-            song = Song.query.get(song_id)
-            if song and song.user_id == current_user.id:
-                album.songs.append(song)
+        db.session.flush()
+        append_tracks(album_song_association, 'album_id', album.id, selected_song_ids)
+        index_album(album.id)
+        index_songs(selected_song_ids)
+        CreatorStats.bump(current_user.id, album_count=1)
+        StatsRollup.bump('albums', 'all')
         db.session.commit()
+        cache.invalidate(('catalog', 'all'), ('album', album.id))
         flash("Album successfully created!", 'success')
         return redirect(url_for('creator_homepage'))
     return render_template('make_album.html', songs=Song.query.filter_by(user_id=current_user.id).all())
 
 @app.route('/view_album/<int:album_id>')
 def view_album(album_id):
-    album = Album.query.get(album_id)
+    album = cache.memoize(cache.key('album', ('album', album_id)), lambda: load_album(album_id))
     if album:
         return render_template('view_album.html', album=album)
     else:
         abort(404)
 
 @app.route('/rate/<int:song_id>', methods=['POST'])
+@login_required
 def rate_song(song_id):
-    rating_value = int(request.form.get('rating'))
-    song = Song.query.get(song_id)
-    existing_rating = Rating.query.filter_by(user_id=current_user.id, song_id=song.id).first()
-    if existing_rating:
+    rating_value = request.form.get('rating', type=int)
+    if rating_value not in range(1, 6):
+        abort(400)
+    try:
+        db.session.add(Rating(user_id=current_user.id, song_id=song_id, rating=rating_value))
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
         flash('You have already rated this song!', 'info')
-    else:
-        total_ratings = Rating.query.filter_by(song_id=song.id).count()
-        current_rating_sum = Rating.query.filter_by(song_id=song.id).with_entities(db.func.sum(Rating.rating)).scalar() or 0
-        new_rating_sum = current_rating_sum + rating_value
-        new_average_rating = new_rating_sum / (total_ratings + 1)
-        song.rating = new_average_rating
-        db.session.add(Rating(user_id=current_user.id, song_id=song.id, rating=rating_value))
-        db.session.commit()
-        flash('Song successfully rated!', 'success')
+        return redirect(url_for('user_homepage'))
+    song = db.session.execute(
+        db.update(Song)
+        .where(Song.id == song_id)
+        .values(
+            rating_count=Song.rating_count + 1,
+            rating_sum=Song.rating_sum + rating_value,
+            rating=(Song.rating_sum + rating_value) * 1.0 / (Song.rating_count + 1),
+        )
+        .returning(Song.user_id)
+    ).first()
+    if song is None:
+        db.session.rollback()
+        abort(404)
+    CreatorStats.bump(song.user_id, rating_count=1, rating_sum=rating_value)
+    StatsRollup.bump('ratings_per_day', datetime.utcnow().date().isoformat())
+    job_queue.enqueue('refresh_recommendations', {'user_id': current_user.id},
+                      key=f"refresh_recommendations:{current_user.id}", user_id=current_user.id)
+    cache_tags = song_cache_tags(song_id)
+    db.session.commit()
+    cache.invalidate(*cache_tags)
+    flash('Song successfully rated!', 'success')
     return redirect(url_for('user_homepage'))
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -454,16 +1923,29 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        if not login_allowed(username):
+            return render_template('login.html', error="Too many login attempts. Please try again later."), 429, login_retry_headers()
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and password_verifier.check(user.password_hash, password)
+        except VerifierBusy:
+            return render_template('login.html', error="The server is busy. Please try again in a moment."), 503, login_retry_headers()
+        if valid:
             if user.user_type == 'admin':
                 return redirect(url_for('admin_login'))
+            login_limiter.reset(('user', username))
             login_user(user)
             return redirect(url_for('user_homepage'))
         else:
             return render_template('login.html', error="Incorrect username or password.")
     return render_template('login.html')
 
+def login_allowed(username):
+    return login_limiter.hit(('ip', request.remote_addr)) and login_limiter.hit(('user', username))
+
+def login_retry_headers():
+    return {'Retry-After': str(app.config['LOGIN_RATE_WINDOW'])}
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
@@ -479,6 +1961,7 @@ def register():
         user = User(username=username, user_type=user_type)
         user.set_password(password)
         db.session.add(user)
+        StatsRollup.bump('user_type', user_type)
         db.session.commit()
         login_user(user)
         return redirect(url_for('user_homepage'))
@@ -491,43 +1974,100 @@ def admin_login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
+        if not login_allowed(username):
+            flash("Too many login attempts. Please try again later.", 'danger')
+            return render_template('admin_login.html'), 429, login_retry_headers()
         admin_user = User.query.filter_by(username=username, user_type='admin').first()
-        if admin_user and admin_user.check_password(password):
+        try:
+            valid = admin_user is not None and password_verifier.check(admin_user.password_hash, password)
+        except VerifierBusy:
+            flash("The server is busy. Please try again in a moment.", 'danger')
+            return render_template('admin_login.html'), 503, login_retry_headers()
+        if valid:
+            login_limiter.reset(('user', username))
             login_user(admin_user)
             return redirect(url_for('admin_dashboard'))
         else:
             flash("Incorrect admin username or password.", 'danger')
     return render_template('admin_login.html')
 
+def chart_series(counts):
+    labels = sorted(counts)
+    return {'labels': labels, 'data': [counts[label] for label in labels]}
+
+def load_admin_stats():
+    snapshot = StatsRollup.snapshot()
+    genres = snapshot.get('genre', {})
+    user_types = snapshot.get('user_type', {})
+    return {
+        'total_users_user_type_user': user_types.get('user', 0),
+        'total_users_user_type_creator': user_types.get('creator', 0),
+        'total_tracks_uploaded': sum(genres.values()),
+        'total_albums_uploaded': snapshot.get('albums', {}).get('all', 0),
+        'genres': chart_series(genres),
+        'uploads_per_day': chart_series(snapshot.get('uploads_per_day', {})),
+        'ratings_per_day': chart_series(snapshot.get('ratings_per_day', {})),
+    }
+
+def admin_stats():
+    return cache.memoize('admin:stats', load_admin_stats, ADMIN_STATS_TTL)
+
 @app.route('/admin_dashboard')
 @login_required
 def admin_dashboard():
     if not current_user.is_admin:
         abort(403)
-    total_users_user_type_user = User.get_user_count_by_type('user')
-    total_users_user_type_creator = User.get_user_count_by_type('creator')
-    total_tracks_uploaded = Song.get_total_tracks_count()
-    total_albums_uploaded = Song.get_total_albums_count()
-    genre_wise_song_count = Song.get_song_count_by_genre()
-    all_songs = Song.query.all()
-    if genre_wise_song_count:
-        genres, song_counts = zip(*genre_wise_song_count)
-    else:
-        genres, song_counts = [], []
-    chart_data = {
-        'labels': genres,
-        'data': song_counts,
-    }
-    genre_chart_html = json.dumps(chart_data)
-    return render_template('admin_dashboard.html',
-                           total_users_user_type_user=total_users_user_type_user,
-                           total_users_user_type_creator=total_users_user_type_creator,
-                           total_tracks_uploaded=total_tracks_uploaded,
-                           total_albums_uploaded=total_albums_uploaded,
-                           genres=genres,
-                           song_counts=song_counts,
-                           all_songs=all_songs,
-                           genre_chart_html=genre_chart_html)
+    songs, next_cursor = paginate_songs(Song.query, request.args.get('cursor'))
+    return render_template('admin_dashboard.html', stats=admin_stats(), songs=songs, next_cursor=next_cursor,
+                           charts=trending_charts(), play_events=play_events.stats(), jobs=job_queue.stats())
+
+@app.route('/admin/api/stats')
+@login_required
+def admin_api_stats():
+    if not current_user.is_admin:
+        abort(403)
+    response = jsonify(admin_stats())
+    response.cache_control.private = True
+    response.cache_control.max_age = ADMIN_STATS_TTL
+    return response
+
+@app.route('/admin/api/cache')
+@login_required
+def admin_api_cache():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(cache.stats())
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or not (current_user.is_admin or job.user_id == current_user.id):
+        abort(404)
+    return jsonify(describe_job(job))
+
+@app.route('/admin/api/jobs')
+@login_required
+def admin_api_jobs():
+    if not current_user.is_admin:
+        abort(403)
+    return jsonify(job_queue.stats())
+
+@app.route('/admin/api/transcodes')
+@login_required
+def admin_api_transcodes():
+    if not current_user.is_admin:
+        abort(403)
+    jobs = TranscodeJob.query.order_by(TranscodeJob.id.desc()).limit(50).all()
+    return jsonify(jobs=[{
+        'id': job.id,
+        'song_id': job.song_id,
+        'status': job.status,
+        'timings': json.loads(job.timings) if job.timings else None,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    } for job in jobs])
 
 @app.route('/admin_logout')
 def admin_logout():
@@ -540,8 +2080,9 @@ def change_admin_password():
     form = ChangeAdminPasswordForm()
     if form.validate_on_submit():
         new_password = form.new_password.data
-        current_user.set_password(new_password)
+        db.session.get(User, current_user.id).set_password(new_password)
         db.session.commit()
+        cache.invalidate(('user', current_user.id))
         flash('Admin password changed successfully!', 'success')
         return redirect(url_for('admin_dashboard'))
     return render_template('change_admin_password.html', form=form)
@@ -552,8 +2093,11 @@ def become_creator():
     if current_user.user_type == "creator":
         return redirect(url_for('creator_homepage'))
     if request.method == 'POST':
-        current_user.user_type = "creator"
+        StatsRollup.bump('user_type', current_user.user_type, -1)
+        StatsRollup.bump('user_type', 'creator')
+        db.session.execute(db.update(User).where(User.id == current_user.id).values(user_type="creator"))
         db.session.commit()
+        cache.invalidate(('user', current_user.id))
         return redirect(url_for('creator_homepage'))
     return render_template('become_creator.html')
 
@@ -565,8 +2109,9 @@ def profile():
         if not new_password:
             flash("New password is required.", 'error')
         else:
-            current_user.set_password(new_password)
+            db.session.get(User, current_user.id).set_password(new_password)
             db.session.commit()
+            cache.invalidate(('user', current_user.id))
             flash("Password updated successfully.", 'success')
     return render_template('profile.html')
 
@@ -575,23 +2120,20 @@ def profile():
 def creator_dashboard():
   if current_user.user_type != "creator":
     return redirect(url_for('index'))
+  stats = db.session.get(CreatorStats, current_user.id)
+  if stats is None:
+    stats = CreatorStats.refresh(current_user.id)
+    try:
+      db.session.commit()
+    except IntegrityError:
+      db.session.rollback()
+      stats = db.session.get(CreatorStats, current_user.id)
   creator_songs = Song.query.filter_by(user_id=current_user.id).all()
-  total_songs = len(creator_songs)
-  total_ratings = 0
-  average_rating = 0
-  for song in creator_songs:
-    ratings = Rating.query.filter_by(song_id=song.id).all()
-    total_ratings += len(ratings)
-    for rating in ratings:
-      average_rating += rating.rating
-  if total_ratings > 0:
-    average_rating = average_rating / total_ratings
-  user_albums = User.query.filter_by(id=current_user.id).first().albums
-  total_albums = len(user_albums)
   return render_template('creator_dashboard.html',
-                        total_songs=total_songs,
-                        average_rating=average_rating,
-                        total_albums=total_albums,
+                        total_songs=stats.song_count,
+                        total_ratings=stats.rating_count,
+                        average_rating=stats.average_rating,
+                        total_albums=stats.album_count,
                         creator_songs=creator_songs)
 
 @app.route('/logout')
@@ -604,13 +2146,27 @@ def logout():
 def manage_all_songs():
     if not current_user.is_admin:
         abort(403)
-    all_songs = Song.query.all()
-    return render_template('manage_all_songs.html', all_songs=all_songs)
+    all_songs, next_cursor = paginate_songs(Song.query, request.args.get('cursor'))
+    return render_template('manage_all_songs.html', all_songs=all_songs, next_cursor=next_cursor)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    if not user_id.isdigit():
+        return None
+    return cache.memoize(cache.key('user', ('user', int(user_id))), lambda: load_session_user(int(user_id)),
+                         app.config['USER_CACHE_TTL'])
+
+def load_session_user(user_id):
+    row = db.session.query(User.id, User.username, User.user_type, User.is_active).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return SessionUser(row.id, row.username, row.user_type, row.is_active is not False)
+
+def create_app():
+    if app.config['SECRET_KEY'] == 'your_secret_key':
+        app.logger.warning("SECRET_KEY is the built-in placeholder; set MUSIC_APP_SECRET_KEY in production.")
+    return app
 
 if __name__ == '__main__':
   create_tables()
-  app.run(host='0.0.0.0', port=80)
\ No newline at end of file
+  create_app().run(host='0.0.0.0', port=80)
\ No newline at end of file
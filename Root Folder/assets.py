@@ -0,0 +1,155 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import urllib.request
+
+import click
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+VENDOR_ASSETS = {
+    'bootstrap.min.css': ('https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/css/bootstrap.min.css',
+                          'sha384-T3c6CoIi6uLrA9TneNEoa7RxnatzjcDSCmG1MXxSR1GAsXEV/Dwwykc2MPK8M2HN'),
+    'bootstrap.bundle.min.js': ('https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/js/bootstrap.bundle.min.js',
+                                'sha384-C6RzsynM9kWDrMNeT87bh95OGNyZPhcTNXj1NW7RuBCsyN/o0jlpcV8Qyq46cDfL'),
+    'plotly.min.js': ('https://cdn.plot.ly/plotly-2.27.0.min.js',
+                      'sha384-Hl48Kq2HifOWdXEjMsKo6qxqvRLTYqIGbvlENBmkHAxZKIGCXv43H6W1jA671RzC'),
+}
+VENDOR_FOLDER = 'vendor'
+DIST_FOLDER = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.map', '.txt'}
+
+
+def subresource_integrity(content):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode()
+
+
+def vendor_assets(static_folder, refresh=False):
+    directory = os.path.join(static_folder, VENDOR_FOLDER)
+    os.makedirs(directory, exist_ok=True)
+    fetched = []
+    for name, (url, integrity) in VENDOR_ASSETS.items():
+        path = os.path.join(directory, name)
+        if os.path.exists(path) and not refresh:
+            with open(path, 'rb') as f:
+                if subresource_integrity(f.read()) == integrity:
+                    continue
+        with urllib.request.urlopen(url, timeout=60) as response:
+            content = response.read()
+        if subresource_integrity(content) != integrity:
+            raise click.ClickException(f"{url} does not match its pinned integrity {integrity}.")
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+        fetched.append(name)
+    return fetched
+
+
+def fingerprinted_name(name, content):
+    stem, extension = os.path.splitext(name)
+    if stem.endswith('.min'):
+        stem, extension = stem[:-4], '.min' + extension
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def compress_variants(path, content):
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return ['gzip']
+    with open(path + '.br', 'wb') as f:
+        f.write(brotli.compress(content, quality=11))
+    return ['gzip', 'br']
+
+
+def build_assets(static_folder):
+    source = os.path.join(static_folder, VENDOR_FOLDER)
+    target = os.path.join(static_folder, DIST_FOLDER)
+    os.makedirs(target, exist_ok=True)
+    manifest = {}
+    encodings = set()
+    for name in sorted(os.listdir(source)):
+        with open(os.path.join(source, name), 'rb') as f:
+            content = f.read()
+        built = fingerprinted_name(name, content)
+        path = os.path.join(target, built)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(content)
+        if os.path.splitext(name)[1] in COMPRESSIBLE:
+            encodings.update(compress_variants(path, content))
+        manifest[name] = built
+    stale = set(os.listdir(target)) - {MANIFEST} - {
+        built + suffix for built in manifest.values() for suffix in ('', '.gz', '.br')
+    }
+    for name in stale:
+        os.remove(os.path.join(target, name))
+    with open(os.path.join(target, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest, sorted(encodings)
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_FOLDER, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def send_asset(directory, filename, immutable=False):
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding = next((encoding for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+                     if request.accept_encodings[encoding] and os.path.isfile(path + suffix)), None)
+    max_age = IMMUTABLE_MAX_AGE if immutable else 0
+    if encoding:
+        response = send_file(path + ('.br' if encoding == 'br' else '.gz'), mimetype=mimetype, max_age=max_age)
+        response.content_encoding = encoding
+    else:
+        response = send_file(path, mimetype=mimetype, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def init_assets(app):
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        immutable = filename in app.extensions['asset_manifest'].values()
+        return send_asset(os.path.join(app.static_folder, DIST_FOLDER), filename, immutable)
+
+    @app.template_global()
+    def asset_url(name):
+        built = app.extensions['asset_manifest'].get(name)
+        if built is None:
+            return VENDOR_ASSETS[name][0]
+        return url_for('asset', filename=built)
+
+    @app.template_global()
+    def asset_integrity(name):
+        return VENDOR_ASSETS[name][1]
+
+    @app.cli.command('build-assets')
+    @click.option('--refresh', is_flag=True, help='Download the vendored files again.')
+    def build_assets_command(refresh):
+        fetched = vendor_assets(app.static_folder, refresh)
+        manifest, encodings = build_assets(app.static_folder)
+        app.extensions['asset_manifest'] = manifest
+        click.echo(f"Vendored {len(fetched)} new files; built {len(manifest)} assets "
+                   f"({', '.join(encodings) or 'no'} precompressed variants) into static/{DIST_FOLDER}.")
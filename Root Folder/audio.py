@@ -0,0 +1,111 @@
+import os
+import re
+import struct
+
+ID3_TEXT_FRAMES = {
+    'TIT2': 'title', 'TT2': 'title',
+    'TPE1': 'singer', 'TP1': 'singer',
+    'TALB': 'album', 'TAL': 'album',
+    'TCON': 'genre', 'TCO': 'genre',
+    'TDRC': 'year', 'TYER': 'year', 'TYE': 'year',
+}
+ID3_ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+MPEG1_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320]
+MPEG2_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+HEADER_SCAN_BYTES = 64 * 1024
+
+
+def syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def decode_text_frame(payload):
+    if not payload:
+        return None
+    text = payload[1:].decode(ID3_ENCODINGS.get(payload[0], 'latin-1'), errors='replace')
+    text = text.replace('\x00', ' ').strip()
+    return re.sub(r'^\(\d+\)', '', text).strip() or None
+
+
+def read_id3v2(f):
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return {}, 0
+    version, flags, size = header[3], header[5], syncsafe(header[6:10])
+    tag = f.read(size)
+    tags = {}
+    offset = 0
+    if flags & 0x40 and version >= 3:
+        offset = syncsafe(tag[:4]) if version == 4 else struct.unpack('>I', tag[:4])[0] + 4
+    id_length, header_length = (3, 6) if version == 2 else (4, 10)
+    while offset + header_length <= len(tag):
+        frame_id = tag[offset:offset + id_length].decode('latin-1')
+        if not frame_id.strip('\x00'):
+            break
+        if version == 2:
+            frame_size = int.from_bytes(tag[offset + 3:offset + 6], 'big')
+        elif version == 4:
+            frame_size = syncsafe(tag[offset + 4:offset + 8])
+        else:
+            frame_size = struct.unpack('>I', tag[offset + 4:offset + 8])[0]
+        payload = tag[offset + header_length:offset + header_length + frame_size]
+        field = ID3_TEXT_FRAMES.get(frame_id)
+        if field and field not in tags:
+            tags[field] = decode_text_frame(payload)
+        offset += header_length + frame_size
+    return tags, 10 + size + (10 if flags & 0x10 else 0)
+
+
+def read_id3v1(f, file_size):
+    if file_size < 128:
+        return {}
+    f.seek(file_size - 128)
+    tag = f.read(128)
+    if tag[:3] != b'TAG':
+        return {}
+    fields = {'title': tag[3:33], 'singer': tag[33:63], 'album': tag[63:93], 'year': tag[93:97]}
+    return {name: value.split(b'\x00')[0].decode('latin-1').strip() or None for name, value in fields.items()}
+
+
+def read_mpeg_header(f, audio_start, audio_bytes):
+    f.seek(audio_start)
+    data = f.read(HEADER_SCAN_BYTES)
+    for offset in range(len(data) - 4):
+        if data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+            continue
+        header = struct.unpack('>I', data[offset:offset + 4])[0]
+        version = (header >> 19) & 3
+        layer = (header >> 17) & 3
+        bitrate_index = (header >> 12) & 0xF
+        sample_rate_index = (header >> 10) & 3
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            continue
+        mono = (header >> 6) & 3 == 3
+        bitrate = (MPEG1_BITRATES if version == 3 else MPEG2_BITRATES)[bitrate_index]
+        sample_rate = SAMPLE_RATES[version][sample_rate_index]
+        samples_per_frame = 1152 if version == 3 else 576
+        side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+        xing = data[offset + 4 + side_info:offset + 4 + side_info + 12]
+        if xing[:4] in (b'Xing', b'Info') and struct.unpack('>I', xing[4:8])[0] & 1:
+            frames = struct.unpack('>I', xing[8:12])[0]
+            duration = frames * samples_per_frame / sample_rate
+            if duration:
+                bitrate = round(audio_bytes * 8 / duration / 1000)
+        else:
+            duration = audio_bytes * 8 / (bitrate * 1000)
+        return {'duration': round(duration, 3), 'bitrate': bitrate, 'sample_rate': sample_rate}
+    return {}
+
+
+def read_metadata(path):
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        tags, audio_start = read_id3v2(f)
+        fallback = read_id3v1(f, file_size)
+        audio_end = file_size - (128 if fallback else 0)
+        metadata = {**{k: v for k, v in fallback.items() if v}, **{k: v for k, v in tags.items() if v}}
+        metadata.update(read_mpeg_header(f, audio_start, max(audio_end - audio_start, 0)))
+    year = re.match(r'\d{4}', metadata.get('year') or '')
+    metadata['year'] = int(year.group()) if year else None
+    return metadata
@@ -0,0 +1,72 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash
+
+
+class SessionUser:
+    __slots__ = ('id', 'username', 'user_type', 'active')
+    is_authenticated = True
+    is_anonymous = False
+    def __init__(self, id, username, user_type, active=True):
+        self.id = id
+        self.username = username
+        self.user_type = user_type
+        self.active = active
+    @property
+    def is_active(self):
+        return self.active
+    @property
+    def is_admin(self):
+        return self.user_type == 'admin'
+    def get_id(self):
+        return str(self.id)
+
+
+class RateLimiter:
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+    def hit(self, key):
+        if not self.limit:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            start, count = self._windows.get(key, (now, 0))
+            if now - start >= self.window:
+                start, count = now, 0
+            count += 1
+            self._windows[key] = (start, count)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        return count <= self.limit
+    def reset(self, key):
+        with self._lock:
+            self._windows.pop(key, None)
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+class PasswordVerifier:
+    def __init__(self, workers, queue_size):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+    def check(self, password_hash, password):
+        if not self._slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            return self._executor.submit(check_password_hash, password_hash, password).result()
+        finally:
+            self._slots.release()
+
+
+def create_password_verifier(workers=4, queue_size=16):
+    return PasswordVerifier(workers, queue_size)
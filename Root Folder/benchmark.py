@@ -0,0 +1,424 @@
+import argparse
+import hashlib
+import http.cookiejar
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_DB = 'benchmark.sqlite3'
+BENCHMARK_AUDIO = os.path.join(BASE_DIR, 'instance', 'benchmark-audio')
+PASSWORD = 'benchmark'
+GENRES = ['Pop', 'Rock', 'Hip Hop', 'Jazz', 'Classical', 'Blues', 'Country', 'Electronic', 'Folk', 'Metal', 'R&B', 'Reggae']
+SYLLABLES = ['la', 'mo', 'ri', 'ta', 'ven', 'so', 'kai', 'dre', 'lu', 'min', 'ro', 'sha', 'el', 'no', 'vi', 'ga']
+INSERT_CHUNK = 10000
+SCENARIOS = {
+    'search_results': 15,
+    'user_homepage': 20,
+    'song_details': 25,
+    'rate_song': 10,
+    'add_to_playlist': 5,
+    'creator_dashboard': 5,
+    'admin_dashboard': 2,
+    'stream_song': 18,
+    'play_event': 10,
+}
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| *(\S+)$')
+
+os.environ.setdefault('MUSIC_APP_SQLALCHEMY_DATABASE_URI', f'sqlite:///{BENCHMARK_DB}')
+os.environ.setdefault('MUSIC_APP_AUDIO_STORAGE_URL', BENCHMARK_AUDIO)
+sys.path.insert(0, BASE_DIR)
+
+
+def silent_mp3(frames=400):
+    frame = b'\xff\xfb\x90\x64' + b'\x00' * 413
+    return frame * frames
+
+
+def make_words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def insert_rows(db, table, rows):
+    rows = iter(rows)
+    while chunk := list(islice(rows, INSERT_CHUNK)):
+        db.session.execute(db.insert(table), chunk)
+
+
+def seed(args):
+    from werkzeug.security import generate_password_hash
+    import app as music_app
+    from app import app, db, User, Song, SongLyrics, Rating, Playlist, Album, AudioBlob, StatsRollup
+    from app import playlist_song_association, album_song_association, storage
+
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    database = os.path.join(app.instance_path, BENCHMARK_DB)
+    if os.path.exists(database) and not args.reset:
+        sys.exit(f"{database} already exists; pass --reset to rebuild it.")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    music_app.create_tables()
+
+    with app.app_context():
+        started = time.perf_counter()
+        password_hash = generate_password_hash(PASSWORD)
+        creators = max(1, args.songs // 200)
+        insert_rows(db, User, ({'username': f'creator{i}', 'password_hash': password_hash, 'user_type': 'creator', 'is_active': True}
+                               for i in range(creators)))
+        insert_rows(db, User, ({'username': f'listener{i}', 'password_hash': password_hash, 'user_type': 'user', 'is_active': True}
+                               for i in range(args.users)))
+        creator_ids = [id for id, in db.session.query(User.id).filter(User.user_type == 'creator').order_by(User.id)]
+        listener_ids = np.array([id for id, in db.session.query(User.id).filter(User.user_type == 'user').order_by(User.id)])
+        audio = silent_mp3()
+        content_hash = hashlib.sha256(audio).hexdigest()
+        storage.put(content_hash, io.BytesIO(audio))
+        db.session.add(AudioBlob(content_hash=content_hash, size=len(audio), ref_count=args.songs))
+
+        words = make_words(rng, 2000)
+        now = datetime.utcnow()
+        def song_rows():
+            for i in range(args.songs):
+                creator_index = i % creators
+                yield {
+                    'title': ' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))).title(),
+                    'singer': f'{rng.choice(words).title()} {rng.choice(words).title()}',
+                    'artist': f'creator{creator_index}',
+                    'genre': rng.choice(GENRES),
+                    'release_date': date(1960, 1, 1) + timedelta(days=rng.randrange(23000)),
+                    'user_id': creator_ids[creator_index],
+                    'created_at': now - timedelta(seconds=rng.randrange(365 * 86400)),
+                    'content_hash': content_hash,
+                    'duration': 10.4,
+                    'bitrate': 128,
+                }
+        insert_rows(db, Song, song_rows())
+        song_ids = np.array([id for id, in db.session.query(Song.id).order_by(Song.id)])
+        insert_rows(db, SongLyrics, (SongLyrics.row(int(song_id), '\n'.join(
+            f'[{line // 12:02d}:{line * 5 % 60:02d}.00]' + ' '.join(rng.choice(words) for _ in range(6)) for line in range(8)
+        )) for song_id in song_ids))
+        print(f"Seeded {creators} creators, {args.users} listeners and {args.songs} songs")
+
+        pairs = np.unique(np_rng.integers(0, len(listener_ids) * len(song_ids), size=int(args.ratings * 1.05)))
+        pairs = np_rng.permutation(pairs)[:args.ratings]
+        users, songs = listener_ids[pairs // len(song_ids)], song_ids[pairs % len(song_ids)]
+        values = np_rng.integers(1, 6, size=len(pairs))
+        rated_at = np_rng.integers(0, 365 * 86400, size=len(pairs))
+        insert_rows(db, Rating, (
+            {'user_id': int(user), 'song_id': int(song), 'rating': int(value), 'created_at': now - timedelta(seconds=int(seconds))}
+            for user, song, value, seconds in zip(users, songs, values, rated_at)
+        ))
+        print(f"Seeded {len(pairs)} ratings")
+
+        insert_rows(db, Playlist, ({'name': f'Playlist {i}', 'user_id': int(owner)}
+                                   for i, owner in enumerate(np_rng.choice(listener_ids, size=args.playlists))))
+        playlist_ids = [id for id, in db.session.query(Playlist.id).order_by(Playlist.id)]
+        insert_rows(db, playlist_song_association, (
+            {'playlist_id': playlist_id, 'song_id': int(song_id)}
+            for playlist_id in playlist_ids
+            for song_id in np_rng.choice(song_ids, size=min(len(song_ids), rng.randint(5, 30)), replace=False)
+        ))
+        print(f"Seeded {args.playlists} playlists")
+
+        album_rows, album_songs = [], []
+        for creator_index, creator_id in enumerate(creator_ids):
+            creator_songs = song_ids[creator_index::creators]
+            for start in range(0, len(creator_songs), 10):
+                album_rows.append({'name': f'{rng.choice(words).title()} Sessions', 'creator_id': creator_id})
+                album_songs.append(creator_songs[start:start + 10])
+        insert_rows(db, Album, album_rows)
+        album_ids = [id for id, in db.session.query(Album.id).order_by(Album.id)]
+        insert_rows(db, album_song_association, [
+            {'album_id': album_id, 'song_id': int(song_id)} for album_id, songs in zip(album_ids, album_songs) for song_id in songs
+        ])
+        print(f"Seeded {len(album_ids)} albums")
+
+        music_app.reconcile_song_ratings()
+        StatsRollup.rebuild()
+        music_app.rebuild_search_index()
+        db.session.commit()
+        if not args.skip_recommendations:
+            music_app.rebuild_recommendations()
+        print(f"Seeded {database} in {time.perf_counter() - started:.1f}s")
+
+
+class InProcessClient:
+    def __init__(self):
+        from app import app
+        self.app = app
+        self.clients = {}
+    def client_for(self, user):
+        key = user and user['id']
+        if key not in self.clients:
+            client = self.app.test_client()
+            if user:
+                with client.session_transaction() as session:
+                    session['_user_id'] = str(user['id'])
+                    session['_fresh'] = True
+            self.clients[key] = client
+        return self.clients[key]
+    def request(self, method, path, data=None, user=None, headers=None):
+        response = self.client_for(user).open(path, method=method, data=data, headers=headers)
+        response.get_data()
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.openers = {}
+    def opener_for(self, user):
+        key = user and user['id']
+        if key not in self.openers:
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+            if user:
+                login_path = '/admin/login' if user['user_type'] == 'admin' else '/login'
+                self.send(opener, 'POST', login_path, {'username': user['username'], 'password': user['password']})
+            self.openers[key] = opener
+        return self.openers[key]
+    def send(self, opener, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, error.headers.get('Server-Timing', '')
+    def request(self, method, path, data=None, user=None, headers=None):
+        return self.send(self.opener_for(user), method, path, data, headers)
+
+
+def as_user(row, password=PASSWORD):
+    return {'id': row.id, 'username': row.username, 'user_type': row.user_type, 'password': password}
+
+
+def load_context(pool_size):
+    from app import app, db, User, Song, Playlist
+    with app.app_context():
+        listeners = (db.session.query(User.id, User.username, User.user_type)
+                     .filter(User.user_type == 'user', User.playlists.any()).limit(pool_size).all())
+        creators = db.session.query(User.id, User.username, User.user_type).filter(User.user_type == 'creator').limit(pool_size).all()
+        admin = db.session.query(User.id, User.username, User.user_type).filter(User.user_type == 'admin').first()
+        max_song_id = db.session.query(db.func.max(Song.id)).scalar() or 0
+        playlists = {}
+        for playlist_id, user_id in db.session.query(Playlist.id, Playlist.user_id).filter(Playlist.user_id.in_([l.id for l in listeners])):
+            playlists.setdefault(user_id, []).append(playlist_id)
+        titles = [title for title, in db.session.query(Song.title).limit(1000)]
+    if not listeners or not creators or not max_song_id:
+        sys.exit("The database has no listeners with playlists, creators or songs; run 'python benchmark.py seed' first.")
+    return {
+        'listeners': [as_user(row) for row in listeners],
+        'creators': [as_user(row) for row in creators],
+        'admin': as_user(admin, password='admin'),
+        'max_song_id': max_song_id,
+        'playlists': playlists,
+        'words': sorted({word.lower() for title in titles for word in title.split()}) or ['a'],
+    }
+
+
+def build_request(scenario, context, rng):
+    song_id = rng.randint(1, context['max_song_id'])
+    listener = rng.choice(context['listeners'])
+    if scenario == 'search_results':
+        return 'GET', f"/search_results?query={urllib.parse.quote(rng.choice(context['words']))}", None, listener, None
+    if scenario == 'user_homepage':
+        return 'GET', '/user', None, listener, None
+    if scenario == 'song_details':
+        return 'GET', f'/song/{song_id}', None, None, None
+    if scenario == 'rate_song':
+        return 'POST', f'/rate/{song_id}', {'rating': rng.randint(1, 5)}, listener, None
+    if scenario == 'add_to_playlist':
+        playlist_id = rng.choice(context['playlists'][listener['id']])
+        return 'POST', f'/add_to_playlist/{song_id}', {'playlist_id': playlist_id}, listener, None
+    if scenario == 'creator_dashboard':
+        return 'GET', '/creator_dashboard', None, rng.choice(context['creators']), None
+    if scenario == 'admin_dashboard':
+        return 'GET', '/admin_dashboard', None, context['admin'], None
+    if scenario == 'play_event':
+        return 'POST', '/events/play', {'song_id': song_id}, listener, None
+    return 'GET', f'/stream/{song_id}', None, None, {'Range': 'bytes=0-65535'}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarise(samples, elapsed):
+    routes = {}
+    for scenario in SCENARIOS:
+        rows = [row for row in samples if row[0] == scenario]
+        if not rows:
+            continue
+        latencies = [row[1] * 1000 for row in rows]
+        queries = [row[3] for row in rows if row[3] is not None]
+        routes[scenario] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 400),
+            'rps': len(rows) / elapsed,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'queries': sum(queries) / len(queries) if queries else None,
+        }
+    return {
+        'routes': routes,
+        'total': {'requests': len(samples), 'errors': sum(1 for row in samples if row[2] >= 400),
+                  'elapsed_s': elapsed, 'rps': len(samples) / elapsed},
+    }
+
+
+def print_report(report):
+    print(f"{'route':<20}{'requests':>10}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for scenario, row in report['routes'].items():
+        queries = '-' if row['queries'] is None else f"{row['queries']:.1f}"
+        print(f"{scenario:<20}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{queries:>9}")
+    total = report['total']
+    print(f"{total['requests']} requests, {total['errors']} errors in {total['elapsed_s']:.1f}s ({total['rps']:.1f} req/s)")
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for scenario, row in report['routes'].items():
+        base = baseline['routes'].get(scenario)
+        if not base:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {base['p95_ms']:.1f}ms -> {row['p95_ms']:.1f}ms")
+        if row['queries'] is not None and base['queries'] is not None and row['queries'] > base['queries'] + 0.5:
+            regressions.append(f"{scenario}: queries/request {base['queries']:.1f} -> {row['queries']:.1f}")
+        if row['errors'] > base['errors']:
+            regressions.append(f"{scenario}: errors {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    context = load_context(args.pool)
+    scenarios = [name for name in SCENARIOS if not args.only or name in args.only]
+    weights = [SCENARIOS[name] for name in scenarios]
+    plan = [build_request(scenario, context, rng) + (scenario,)
+            for scenario in rng.choices(scenarios, weights, k=args.warmup + args.requests)]
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = HttpClient(args.url) if args.url else InProcessClient()
+        return local.client
+
+    def execute(entry):
+        method, path, data, user, headers, scenario = entry
+        started = time.perf_counter()
+        status, server_timing = client().request(method, path, data, user, headers)
+        elapsed = time.perf_counter() - started
+        match = QUERY_COUNT.search(server_timing)
+        return scenario, elapsed, status, int(match.group(1)) if match else None
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(execute, plan[:args.warmup]))
+        started = time.perf_counter()
+        samples = list(executor.map(execute, plan[args.warmup:]))
+        elapsed = time.perf_counter() - started
+
+    report = summarise(samples, elapsed)
+    report['config'] = {'requests': args.requests, 'concurrency': args.concurrency, 'seed': args.seed, 'target': args.url or 'in-process'}
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def slowest_imports(importtime_output, limit=10):
+    modules = []
+    for line in importtime_output.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match and '.' not in match.group(3) and match.group(3) not in ('wsgi', 'app'):
+            modules.append((int(match.group(2)) / 1e6, match.group(3)))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def startup(args):
+    command = [sys.executable, '-X', 'importtime', '-c', 'import wsgi']
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        result = subprocess.run(command, cwd=BASE_DIR, capture_output=True, text=True)
+        timings.append(time.perf_counter() - started)
+        if result.returncode:
+            sys.exit(result.stderr)
+    median = statistics.median(timings)
+    print(f"worker boot (import wsgi): median {median:.2f}s, min {min(timings):.2f}s, max {max(timings):.2f}s over {args.runs} runs")
+    for seconds, module in slowest_imports(result.stderr):
+        print(f"  {seconds:>7.3f}s  {module}")
+    if args.budget and median > args.budget:
+        print(f"REGRESSION startup: median {median:.2f}s exceeds the {args.budget:.2f}s budget")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a synthetic catalog and benchmark the main listener and creator routes.')
+    parser.add_argument('--seed', type=int, default=1234)
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed_parser = commands.add_parser('seed', help=f'Create instance/{BENCHMARK_DB} with synthetic data.')
+    seed_parser.add_argument('--songs', type=int, default=100000)
+    seed_parser.add_argument('--users', type=int, default=20000)
+    seed_parser.add_argument('--ratings', type=int, default=1000000)
+    seed_parser.add_argument('--playlists', type=int, default=50000)
+    seed_parser.add_argument('--skip-recommendations', action='store_true')
+    seed_parser.add_argument('--reset', action='store_true', help='Delete an existing benchmark database first.')
+    run_parser = commands.add_parser('run', help='Drive the routes with concurrent clients and report latencies.')
+    run_parser.add_argument('--requests', type=int, default=2000)
+    run_parser.add_argument('--warmup', type=int, default=200)
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--pool', type=int, default=200, help='Number of listeners and creators to sample from.')
+    run_parser.add_argument('--only', nargs='+', choices=list(SCENARIOS))
+    run_parser.add_argument('--url', help='Benchmark a running server instead of the in-process app.')
+    run_parser.add_argument('--json', help='Write the report to this file.')
+    run_parser.add_argument('--baseline', help='Fail if p95 latency, query counts or errors regress against this report.')
+    run_parser.add_argument('--tolerance', type=float, default=0.25)
+    startup_parser = commands.add_parser('startup', help='Time a fresh worker boot and list the slowest imports.')
+    startup_parser.add_argument('--runs', type=int, default=5)
+    startup_parser.add_argument('--budget', type=float, default=2.0, help='Fail if the median boot time exceeds this many seconds.')
+    args = parser.parse_args()
+    {'seed': seed, 'run': run, 'startup': startup}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
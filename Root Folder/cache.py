@@ -0,0 +1,104 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+VERSION_TTL = 30 * 24 * 3600
+
+
+class LRUCache:
+    def __init__(self, max_entries=2048, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    def __init__(self, client, prefix='music_app:', default_ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.default_ttl)
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class Cache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+    def version(self, entity, entity_id):
+        key = f"version:{entity}:{entity_id}"
+        version = self.backend.get(key)
+        if version is None:
+            version = time.time_ns()
+            self.backend.set(key, version, VERSION_TTL)
+        return version
+    def key(self, name, *tags):
+        return ':'.join([name] + [f"{entity}{entity_id}@{self.version(entity, entity_id)}" for entity, entity_id in tags])
+    def invalidate(self, *tags):
+        for entity, entity_id in tags:
+            self.backend.set(f"version:{entity}:{entity_id}", time.time_ns(), VERSION_TTL)
+    def memoize(self, key, producer, ttl=None):
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = producer()
+        if value is not None:
+            self.backend.set(key, value, ttl)
+        return value
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_cache(url=None, max_entries=2048, default_ttl=300):
+    if url:
+        import redis
+        return Cache(RedisCache(redis.Redis.from_url(url), default_ttl=default_ttl))
+    return Cache(LRUCache(max_entries=max_entries, default_ttl=default_ttl))
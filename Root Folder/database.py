@@ -0,0 +1,65 @@
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and getattr(clause, 'is_select', False)
+                and has_request_context() and request.method in READ_ONLY_METHODS):
+            return self._db.engines['reader']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def engine_options(url, config):
+    if is_sqlite(url):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_pre_ping': True,
+    }
+
+
+def configure_database(config):
+    writer_url = config['SQLALCHEMY_DATABASE_URI']
+    reader_url = config['SQLALCHEMY_READ_DATABASE_URI'] or writer_url
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(writer_url, config), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    config['SQLALCHEMY_BINDS'] = {'reader': {'url': reader_url, **engine_options(reader_url, config)}}
+
+
+def install_sqlite_pragmas(engine, busy_timeout, mmap_size, read_only=False, functions=None):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        for name, function in (functions or {}).items():
+            dbapi_connection.create_function(name, function.__code__.co_argcount, function, deterministic=True)
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+
+def tune_engines(app, db, functions=None):
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite':
+                install_sqlite_pragmas(engine, app.config['SQLITE_BUSY_TIMEOUT'], app.config['SQLITE_MMAP_SIZE'],
+                                       read_only=bind_key == 'reader', functions=functions)
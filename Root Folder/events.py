@@ -0,0 +1,52 @@
+import atexit
+import os
+import threading
+from collections import deque
+
+
+class EventBuffer:
+    def __init__(self, writer, capacity=100000, batch_size=500, interval=2.0):
+        self.writer = writer
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._events = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+    def add(self, event):
+        with self._lock:
+            if len(self._events) == self.capacity:
+                self.dropped += 1
+            self._events.append(event)
+            pending = len(self._events)
+            start_worker = self._pid != os.getpid()
+            self._pid = os.getpid()
+        if start_worker:
+            threading.Thread(target=self._run, name='event-flush', daemon=True).start()
+            atexit.register(self.flush)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+    def drain(self, limit):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(limit, len(self._events)))]
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                batch = self.drain(self.batch_size)
+                if not batch:
+                    return
+                self.writer(batch)
+    def stats(self):
+        return {'pending': len(self._events), 'dropped': self.dropped, 'capacity': self.capacity}
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def create_event_buffer(writer, capacity=100000, batch_size=500, interval=2.0):
+    return EventBuffer(writer, capacity, batch_size, interval)
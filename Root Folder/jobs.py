@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import random
+import socket
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+JobType = namedtuple('JobType', 'function concurrency max_attempts priority')
+ERROR_BACKOFF_CAP = 60
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempt, base, cap):
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def describe_job(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'priority': job.priority,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_at': job.run_at and job.run_at.isoformat(),
+        'created_at': job.created_at and job.created_at.isoformat(),
+        'finished_at': job.finished_at and job.finished_at.isoformat(),
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+    }
+
+
+class JobQueue:
+    def __init__(self, db, model, backoff_base=10, backoff_cap=3600, lease=900):
+        self.db = db
+        self.model = model
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.lease = lease
+        self.types = {}
+        self._current = threading.local()
+    def handler(self, kind, concurrency=1, max_attempts=5, priority=0):
+        def register(function):
+            self.types[kind] = JobType(function, concurrency, max_attempts, priority)
+            return function
+        return register
+    def enqueue(self, kind, payload=None, priority=None, key=None, delay=0, user_id=None):
+        job_type = self.types[kind]
+        if key is not None:
+            pending = self.model.query.filter_by(key=key, status='queued').first()
+            if pending is not None:
+                return pending
+        job = self.model(kind=kind, payload=json.dumps(payload or {}), key=key, user_id=user_id,
+                         priority=job_type.priority if priority is None else priority,
+                         max_attempts=job_type.max_attempts, run_at=datetime.utcnow() + timedelta(seconds=delay))
+        self.db.session.add(job)
+        return job
+    def claim(self, worker_id, kinds=None):
+        Job = self.model
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=self.lease)
+        live = (Job.status == 'running') & (Job.locked_at >= expired)
+        stale = (Job.status == 'running') & (Job.locked_at < expired)
+        Job.query.filter(stale, Job.attempts >= Job.max_attempts).update(
+            {Job.status: 'failed', Job.error: 'Lease expired on the final attempt', Job.finished_at: now}, synchronize_session=False
+        )
+        running = dict(self.db.session.query(Job.kind, self.db.func.count(Job.id)).filter(live).group_by(Job.kind).all())
+        open_kinds = [kind for kind, job_type in self.types.items()
+                      if running.get(kind, 0) < job_type.concurrency and (kinds is None or kind in kinds)]
+        while open_kinds:
+            job = (
+                Job.query
+                .filter(Job.kind.in_(open_kinds))
+                .filter(((Job.status == 'queued') & (Job.run_at <= now)) | stale)
+                .order_by(Job.priority.desc(), Job.run_at, Job.id)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                break
+            claimed = Job.query.filter(Job.id == job.id, Job.status == job.status, Job.attempts == job.attempts).update(
+                {Job.status: 'running', Job.locked_by: worker_id, Job.locked_at: now, Job.attempts: Job.attempts + 1},
+                synchronize_session=False
+            )
+            self.db.session.commit()
+            if claimed:
+                return job
+        self.db.session.commit()
+        return None
+    def complete(self, job, result=None):
+        job.status = 'done'
+        job.result = None if result is None else json.dumps(result)
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        self.db.session.commit()
+    def fail(self, job, error):
+        job.error = error
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts, self.backoff_base, self.backoff_cap))
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        self.db.session.commit()
+    def run(self, job):
+        job_id, kind, payload = job.id, job.kind, json.loads(job.payload)
+        self.db.session.commit()
+        self._current.job_id = job_id
+        try:
+            result = self.types[kind].function(**payload)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            self.db.session.rollback()
+            self.fail(self.db.session.get(self.model, job_id), f"{type(e).__name__}: {e}")
+            return False
+        finally:
+            self._current.job_id = None
+        self.complete(self.db.session.get(self.model, job_id), result)
+        return True
+    def report(self, progress):
+        job_id = getattr(self._current, 'job_id', None)
+        if job_id is None:
+            return
+        self.db.session.execute(self.db.update(self.model).where(self.model.id == job_id).values(result=json.dumps(progress)))
+        self.db.session.commit()
+    def run_pending(self, worker_id='inline', kinds=None):
+        processed = 0
+        while True:
+            job = self.claim(worker_id, kinds)
+            if job is None:
+                return processed
+            self.run(job)
+            processed += 1
+    def prune(self, older_than):
+        Job = self.model
+        removed = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < datetime.utcnow() - older_than).delete(synchronize_session=False)
+        self.db.session.commit()
+        return removed
+    def stats(self):
+        Job = self.model
+        counts = self.db.session.query(Job.kind, Job.status, self.db.func.count(Job.id)).group_by(Job.kind, Job.status).all()
+        summary = {kind: {'concurrency': job_type.concurrency} for kind, job_type in self.types.items()}
+        for kind, status, count in counts:
+            summary.setdefault(kind, {})[status] = count
+        return summary
+
+
+class Worker:
+    def __init__(self, app, queue, threads=1, poll_interval=1.0, kinds=None, burst=False):
+        self.app = app
+        self.queue = queue
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.kinds = kinds
+        self.burst = burst
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+    def stop(self, *args):
+        self._stop.set()
+    def _loop(self, index):
+        worker_id = f"{self.name}:{index}"
+        errors = 0
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job = self.queue.claim(worker_id, self.kinds)
+                    if job is not None:
+                        succeeded = self.queue.run(job)
+            except Exception:
+                errors += 1
+                logger.exception("Job worker %s failed to poll the queue (%d in a row)", worker_id, errors)
+                self._stop.wait(backoff_delay(errors, self.poll_interval, ERROR_BACKOFF_CAP))
+                continue
+            errors = 0
+            if job is None:
+                if self.burst:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            with self._lock:
+                self.processed += 1
+                self.failed += not succeeded
+    def run(self):
+        threads = [threading.Thread(target=self._loop, args=(index,), name=f'job-worker-{index}')
+                   for index in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+        return self.processed, self.failed
+
+
+def create_job_queue(db, model, backoff_base=10, backoff_cap=3600, lease=900):
+    return JobQueue(db, model, backoff_base, backoff_cap, lease)
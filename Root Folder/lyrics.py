@@ -0,0 +1,59 @@
+import hashlib
+import re
+import zlib
+
+TIME_TAG = re.compile(r'\[(\d+):(\d{1,2}(?:[.:]\d{1,3})?)\]')
+ID_TAG = re.compile(r'^\[([a-z#]+):(.*)\]$', re.IGNORECASE)
+COMPRESS_MIN_BYTES = 512
+
+
+def parse_lrc(text):
+    offset = 0.0
+    timed, plain = [], []
+    for line in (text or '').splitlines():
+        line = line.strip()
+        tag = ID_TAG.match(line)
+        if tag and not TIME_TAG.match(line):
+            if tag.group(1).lower() == 'offset':
+                try:
+                    offset = int(tag.group(2).strip()) / 1000.0
+                except ValueError:
+                    pass
+            continue
+        stamps = TIME_TAG.findall(line)
+        words = TIME_TAG.sub('', line).strip()
+        if not stamps:
+            plain.append({'time': None, 'text': words})
+        for minutes, seconds in stamps:
+            timed.append({'time': int(minutes) * 60 + float(seconds.replace(':', '.')), 'text': words})
+    if not timed:
+        return plain, False
+    for line in timed:
+        line['time'] = round(max(0.0, line['time'] - offset), 3)
+    return sorted(timed, key=lambda line: line['time']), True
+
+
+def plain_text(text):
+    lines, _ = parse_lrc(text)
+    return '\n'.join(line['text'] for line in lines)
+
+
+def encode_lyrics(text, min_size=COMPRESS_MIN_BYTES):
+    raw = text.encode('utf-8')
+    if len(raw) >= min_size:
+        packed = zlib.compress(raw, 9)
+        if len(packed) < len(raw):
+            return packed, 'zlib'
+    return raw, None
+
+
+def decode_lyrics(body, encoding):
+    return (zlib.decompress(body) if encoding == 'zlib' else body).decode('utf-8')
+
+
+def lyrics_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def search_text(body, encoding):
+    return None if body is None else plain_text(decode_lyrics(body, encoding))
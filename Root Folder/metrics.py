@@ -0,0 +1,225 @@
+import cProfile
+import os
+import random
+import threading
+import time
+import traceback
+
+from flask import Response, abort, before_render_template, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    kind = 'histogram'
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{format_labels(self.labels, key, [('le', bound)])} {bucket_count}"
+            yield f"{self.name}_bucket{format_labels(self.labels, key, [('le', '+Inf')])} {count}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self.metrics.append(metric)
+        return metric
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+requests_total = registry.counter('http_requests_total', 'HTTP requests handled.', ('endpoint', 'method', 'status'))
+request_duration = registry.histogram('http_request_duration_seconds', 'Time spent handling a request.', ('endpoint',))
+request_queries = registry.histogram('http_request_db_queries', 'SQL queries issued per request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+query_duration = registry.histogram('db_query_duration_seconds', 'SQL statement execution time.', ('operation',))
+slow_queries_total = registry.counter('db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD.', ('endpoint',))
+template_duration = registry.histogram('template_render_duration_seconds', 'Time spent rendering a template.', ('template',))
+
+
+def query_origin(root_path):
+    this_file = os.path.abspath(__file__)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(root_path) and filename != this_file and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, root_path)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+def request_endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def start_profiler(app):
+    if app.config['PROFILER'] == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def save_profile(app, profiler, duration):
+    if app.config['PROFILER'] == 'pyinstrument':
+        profiler.stop()
+    else:
+        profiler.disable()
+    directory = os.path.join(app.instance_path, app.config['PROFILE_DIR'])
+    os.makedirs(directory, exist_ok=True)
+    name = f"{request_endpoint()}-{time.strftime('%Y%m%dT%H%M%S')}-{int(duration * 1000)}ms"
+    if app.config['PROFILER'] == 'pyinstrument':
+        from pyinstrument.renderers import SpeedscopeRenderer
+        with open(os.path.join(directory, name + '.speedscope.json'), 'w') as f:
+            f.write(profiler.output(SpeedscopeRenderer()))
+    else:
+        profiler.dump_stats(os.path.join(directory, name + '.prof'))
+
+
+def init_metrics(app, db):
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.query_count = 0
+        g.query_time = 0.0
+        g.template_starts = []
+        g.template_time = 0.0
+        rate = app.config['PROFILE_SAMPLE_RATE']
+        g.profiler = start_profiler(app) if rate and random.random() < rate else None
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_start' not in g:
+            return response
+        g.metrics_duration = time.perf_counter() - g.metrics_start
+        endpoint = request_endpoint()
+        requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        request_duration.observe(g.metrics_duration, endpoint=endpoint)
+        request_queries.observe(g.query_count, endpoint=endpoint)
+        response.headers['Server-Timing'] = (
+            f'app;dur={g.metrics_duration * 1000:.1f}, '
+            f'db;dur={g.query_time * 1000:.1f};desc="{g.query_count} queries", '
+            f'tpl;dur={g.template_time * 1000:.1f}'
+        )
+        app.logger.debug("%s %s %s %.1fms, %d queries (%.1fms)", request.method, request.path, response.status_code,
+                         g.metrics_duration * 1000, g.query_count, g.query_time * 1000)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            save_profile(app, profiler, time.perf_counter() - g.metrics_start)
+
+    @before_render_template.connect_via(app)
+    def start_template_timer(sender, template, context, **extra):
+        if has_app_context() and 'template_starts' in g:
+            g.template_starts.append(time.perf_counter())
+
+    @template_rendered.connect_via(app)
+    def record_template(sender, template, context, **extra):
+        if has_app_context() and g.get('template_starts'):
+            elapsed = time.perf_counter() - g.template_starts.pop()
+            if not g.template_starts:
+                g.template_time += elapsed
+            template_duration.observe(elapsed, template=template.name)
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_starts', []).append(time.perf_counter())
+
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info['query_starts'].pop()
+        query_duration.observe(elapsed, operation=statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN')
+        in_request = has_app_context() and 'query_count' in g
+        if in_request:
+            g.query_count += 1
+            g.query_time += elapsed
+        if elapsed >= app.config['SLOW_QUERY_THRESHOLD']:
+            slow_queries_total.inc(endpoint=request_endpoint() if in_request else 'background')
+            app.logger.warning("Slow query (%.1fms) from %s: %s", elapsed * 1000, query_origin(app.root_path),
+                               ' '.join(statement.split())[:500])
+
+    def discard_query_start(context):
+        starts = context.connection.info.get('query_starts') if context.connection is not None else None
+        if context.execution_context is not None and starts:
+            starts.pop()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(engine, 'handle_error', discard_query_start)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,78 @@
+NEIGHBOURS_PER_SONG = 50
+RECOMMENDATIONS_PER_USER = 20
+PLAYLIST_WEIGHT = 0.5
+
+
+def rating_weight(rating):
+    return rating / 5.0
+
+
+def top_k_per_row(matrix, k):
+    import numpy as np
+    matrix = matrix.tocsr()
+    result = {}
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        scores = matrix.data[start:end]
+        columns = matrix.indices[start:end]
+        if end - start > k:
+            keep = np.argpartition(-scores, k)[:k]
+            scores, columns = scores[keep], columns[keep]
+        order = np.argsort(-scores, kind='stable')
+        result[row] = list(zip(columns[order].tolist(), scores[order].tolist()))
+    return result
+
+
+def item_similarity(baskets, neighbours=NEIGHBOURS_PER_SONG):
+    import numpy as np
+    from scipy import sparse
+    norms = np.sqrt(np.asarray(baskets.multiply(baskets).sum(axis=0))).ravel()
+    norms[norms == 0] = 1.0
+    normalised = baskets @ sparse.diags(1.0 / norms)
+    similarity = (normalised.T @ normalised).tolil()
+    similarity.setdiag(0)
+    similarity = similarity.tocsr()
+    similarity.eliminate_zeros()
+    pruned = top_k_per_row(similarity, neighbours)
+    rows = [row for row, items in pruned.items() for _ in items]
+    columns = [column for items in pruned.values() for column, _ in items]
+    scores = [score for items in pruned.values() for _, score in items]
+    return sparse.csr_matrix((scores, (rows, columns)), shape=similarity.shape)
+
+
+def build_recommendations(ratings, playlist_songs, neighbours=NEIGHBOURS_PER_SONG, top_n=RECOMMENDATIONS_PER_USER):
+    import numpy as np
+    from scipy import sparse
+    ratings = np.array(ratings, dtype=np.int64).reshape(-1, 3)
+    playlist_songs = np.array(playlist_songs, dtype=np.int64).reshape(-1, 3)
+    if not len(ratings) and not len(playlist_songs):
+        return {}, {}
+    song_ids, song_index = np.unique(np.concatenate([ratings[:, 1], playlist_songs[:, 2]]), return_inverse=True)
+    user_ids, user_index = np.unique(np.concatenate([ratings[:, 0], playlist_songs[:, 1]]), return_inverse=True)
+    playlist_ids, playlist_index = np.unique(playlist_songs[:, 0], return_inverse=True)
+    rating_songs, playlist_song_index = song_index[:len(ratings)], song_index[len(ratings):]
+    rating_users = user_index[:len(ratings)]
+    weights = np.concatenate([rating_weight(ratings[:, 2]), np.full(len(playlist_songs), PLAYLIST_WEIGHT)])
+
+    baskets = sparse.vstack([
+        sparse.csr_matrix((weights[:len(ratings)], (rating_users, rating_songs)), shape=(len(user_ids), len(song_ids))),
+        sparse.csr_matrix((weights[len(ratings):], (playlist_index, playlist_song_index)), shape=(len(playlist_ids), len(song_ids))),
+    ]).tocsr()
+    similarity = item_similarity(baskets, neighbours)
+
+    profiles = sparse.csr_matrix((weights, (user_index, song_index)), shape=(len(user_ids), len(song_ids)))
+    scores = (profiles @ similarity).tocsr()
+    scores = scores - scores.multiply(profiles > 0)
+    scores.eliminate_zeros()
+
+    neighbours_by_song = {
+        int(song_ids[row]): [(int(song_ids[column]), score) for column, score in items]
+        for row, items in top_k_per_row(similarity, neighbours).items()
+    }
+    recommendations = {
+        int(user_ids[row]): [(int(song_ids[column]), score) for column, score in items]
+        for row, items in top_k_per_row(scores, top_n).items()
+    }
+    return neighbours_by_song, recommendations
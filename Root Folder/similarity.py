@@ -0,0 +1,178 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+VECTORS = 'vectors.f32'
+IDS = 'ids.i64'
+META = 'meta.json'
+LOCK = 'index.lock'
+BATCH_ROWS = 65536
+LOAD_ATTEMPTS = 3
+
+
+def decode_features(blob):
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class SimilarityIndex:
+    def __init__(self, directory, batch_rows=BATCH_ROWS):
+        self.directory = directory
+        self.batch_rows = batch_rows
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._meta = None
+        self._vectors = None
+        self._ids = None
+        self._order = None
+    def _path(self, name, version=None):
+        if version is None:
+            return os.path.join(self.directory, name)
+        return os.path.join(self.directory, version, name)
+    def _refresh(self):
+        for attempt in range(LOAD_ATTEMPTS):
+            try:
+                return self._load()
+            except FileNotFoundError:
+                if attempt == LOAD_ATTEMPTS - 1:
+                    raise
+    def _load(self):
+        try:
+            status = os.stat(self._path(META))
+            stamp = (status.st_ino, status.st_mtime_ns)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp is None:
+                self._stamp, self._meta, self._vectors, self._ids, self._order = None, None, None, None, None
+                return
+            with open(self._path(META)) as f:
+                meta = json.load(f)
+            count, dimensions, version = meta['count'], meta['dimensions'], meta['version']
+            vectors = np.memmap(self._path(VECTORS, version), dtype=np.float32, mode='r',
+                                shape=(count, dimensions)) if count else np.empty((0, dimensions), np.float32)
+            ids = np.fromfile(self._path(IDS, version), dtype=np.int64, count=count)
+            self._stamp, self._meta, self._vectors, self._ids = stamp, meta, vectors, ids
+            self._order = np.argsort(ids, kind='stable')
+    def _row(self, song_id):
+        position = np.searchsorted(self._ids, song_id, sorter=self._order)
+        if position < len(self._order) and self._ids[self._order[position]] == song_id:
+            return int(self._order[position])
+        return None
+    def _normalize(self, features, meta):
+        vectors = (np.atleast_2d(features) - np.asarray(meta['mean'], np.float32)) / np.asarray(meta['scale'], np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(self._path(LOCK), 'a')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+    def _write_meta(self, meta):
+        with open(self._path(META) + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(self._path(META) + '.tmp', self._path(META))
+    def _prune(self, keep):
+        for name in os.listdir(self.directory):
+            if name.startswith('v') and name not in keep and os.path.isdir(self._path(name)):
+                shutil.rmtree(self._path(name), ignore_errors=True)
+    def ready(self):
+        self._refresh()
+        return self._meta is not None
+    def stats(self):
+        self._refresh()
+        if self._meta is None:
+            return {'songs': 0, 'dimensions': 0, 'deleted': 0}
+        deleted = int(np.count_nonzero(self._ids < 0))
+        return {'songs': len(self._ids) - deleted, 'dimensions': self._meta['dimensions'], 'deleted': deleted}
+    def rebuild(self, song_ids, features):
+        matrix = np.vstack(features).astype(np.float32) if len(features) else np.empty((0, 0), np.float32)
+        mean = matrix.mean(axis=0) if len(matrix) else np.zeros(matrix.shape[1], np.float32)
+        scale = matrix.std(axis=0) if len(matrix) else np.ones(matrix.shape[1], np.float32)
+        meta = {'version': f"v{time.time_ns()}", 'count': len(matrix), 'dimensions': matrix.shape[1],
+                'mean': mean.tolist(), 'scale': np.where(scale > 1e-6, scale, 1).tolist()}
+        with self._locked():
+            self._stamp = None
+            self._refresh()
+            previous = self._meta and self._meta['version']
+            os.makedirs(self._path(meta['version']))
+            self._normalize(matrix, meta).tofile(self._path(VECTORS, meta['version']))
+            np.asarray(song_ids, dtype=np.int64).tofile(self._path(IDS, meta['version']))
+            self._write_meta(meta)
+            self._prune({meta['version'], previous})
+        self._stamp = None
+        return len(matrix)
+    def add(self, song_id, features):
+        if not self.ready():
+            return False
+        with self._locked():
+            self._stamp = None
+            self._refresh()
+            meta = self._meta
+            vector = self._normalize(features, meta)
+            if vector.shape[1] != meta['dimensions']:
+                return False
+            row = self._row(song_id)
+            if row is None:
+                with open(self._path(VECTORS, meta['version']), 'ab') as f:
+                    f.write(vector.tobytes())
+                with open(self._path(IDS, meta['version']), 'ab') as f:
+                    f.write(np.int64(song_id).tobytes())
+                meta = dict(meta, count=meta['count'] + 1)
+            else:
+                vectors = np.memmap(self._path(VECTORS, meta['version']), dtype=np.float32, mode='r+', shape=(meta['count'], meta['dimensions']))
+                vectors[row] = vector[0]
+                vectors.flush()
+                del vectors
+            self._write_meta(meta)
+        self._stamp = None
+        return True
+    def remove(self, song_id):
+        if not self.ready():
+            return False
+        with self._locked():
+            self._stamp = None
+            self._refresh()
+            row = self._row(song_id)
+            if row is None:
+                return False
+            ids = np.memmap(self._path(IDS, self._meta['version']), dtype=np.int64, mode='r+', shape=(self._meta['count'],))
+            ids[row] = -1
+            ids.flush()
+            del ids
+            self._write_meta(self._meta)
+        self._stamp = None
+        return True
+    def nearest(self, song_id, limit=10):
+        self._refresh()
+        if self._meta is None:
+            return []
+        vectors, ids = self._vectors, self._ids
+        row = self._row(song_id)
+        if row is None or len(ids) < 2:
+            return []
+        query = np.array(vectors[row])
+        scores = np.empty(len(ids), dtype=np.float32)
+        for start in range(0, len(ids), self.batch_rows):
+            np.dot(vectors[start:start + self.batch_rows], query, out=scores[start:start + self.batch_rows])
+        scores[ids < 0] = -np.inf
+        scores[row] = -np.inf
+        limit = min(limit, len(ids) - 1)
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+
+def create_similarity_index(directory, batch_rows=BATCH_ROWS):
+    return SimilarityIndex(directory, batch_rows)
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage:
+    def __init__(self, root, extension='.mp3'):
+        self.root = root
+        self.extension = extension
+        self.staging_dir = os.path.join(root, '.incoming')
+    def relative_path(self, key):
+        return f"{key[:2]}/{key[2:4]}/{key}{self.extension}"
+    def local_path(self, key):
+        return os.path.join(self.root, *self.relative_path(key).split('/'))
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+    def put(self, key, source):
+        if self.exists(key):
+            return
+        os.makedirs(self.staging_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.staging_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        self.put_file(key, temp_path)
+    def put_file(self, key, path):
+        destination = self.local_path(key)
+        if os.path.exists(destination):
+            os.remove(path)
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+    def url(self, key):
+        return None
+
+
+class S3Storage:
+    def __init__(self, client, bucket, prefix='songs/', extension='.mp3', url_expiry=3600):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.extension = extension
+        self.url_expiry = url_expiry
+        self.staging_dir = tempfile.gettempdir()
+    def relative_path(self, key):
+        return f"{self.prefix}{key[:2]}/{key[2:4]}/{key}{self.extension}"
+    def local_path(self, key):
+        return None
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.relative_path(key))
+        except self.client.exceptions.ClientError:
+            return False
+        return True
+    def put(self, key, source):
+        if not self.exists(key):
+            self.client.upload_fileobj(source, self.bucket, self.relative_path(key), ExtraArgs={'ContentType': 'audio/mpeg'})
+    def put_file(self, key, path):
+        try:
+            if not self.exists(key):
+                self.client.upload_file(path, self.bucket, self.relative_path(key), ExtraArgs={'ContentType': 'audio/mpeg'})
+        finally:
+            os.remove(path)
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.relative_path(key))['Body']
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.relative_path(key))
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.relative_path(key)}, ExpiresIn=self.url_expiry
+        )
+
+
+def create_storage(url, root, endpoint_url=None):
+    if url and url.startswith('s3://'):
+        import boto3
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        client = boto3.client('s3', endpoint_url=endpoint_url)
+        return S3Storage(client, bucket, prefix=prefix.rstrip('/') + '/' if prefix else 'songs/')
+    return LocalStorage(url or root)
@@ -0,0 +1,72 @@
+import io
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = tempfile.mkdtemp(prefix='music-app-tests-')
+os.environ['MUSIC_APP_SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(DATA, 'music_app.sqlite3')
+os.environ['MUSIC_APP_UPLOAD_FOLDER'] = os.path.join(DATA, 'songs')
+os.environ['MUSIC_APP_HLS_FOLDER'] = os.path.join(DATA, 'hls')
+os.environ['MUSIC_APP_SIMILARITY_INDEX_FOLDER'] = os.path.join(DATA, 'similarity')
+os.environ['MUSIC_APP_LOGIN_RATE_LIMIT'] = '0'
+sys.path.insert(0, ROOT)
+
+import app as music_app
+
+COUNTER = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    music_app.create_tables()
+    return music_app.app
+
+
+@pytest.fixture
+def db(app):
+    with app.app_context():
+        yield music_app.db
+        music_app.db.session.rollback()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(user_type='user'):
+        user = music_app.User(username=f"{user_type}-{next(COUNTER)}", user_type=user_type)
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    return make_user
+
+
+@pytest.fixture
+def make_song(db):
+    def make_song(user_id, created_at=None, **fields):
+        fields = {'title': f"Song {next(COUNTER)}", 'artist': 'Artist', 'genre': 'Rock', **fields}
+        song = music_app.Song(user_id=user_id, created_at=created_at or datetime.utcnow(), **fields)
+        db.session.add(song)
+        db.session.commit()
+        return song.id
+    return make_song
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+
+def upload_song(client, title, **fields):
+    data = {'file': (io.BytesIO(b'ID3' + os.urandom(2048)), f"{title}.mp3"), 'title': title, 'singer': 'Singer',
+            'release_date': '2024-01-01', 'genre': 'Rock', 'lyrics': '', **fields}
+    return client.post('/upload', data=data, content_type='multipart/form-data')
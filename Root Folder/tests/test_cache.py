@@ -0,0 +1,55 @@
+import app as music_app
+from cache import create_cache
+from conftest import log_in
+
+
+def test_invalidate_changes_only_tagged_keys():
+    cache = create_cache()
+    song = cache.key('song', ('song', 1), ('catalog', 'all'))
+    other = cache.key('song', ('song', 2))
+    assert cache.key('song', ('song', 1), ('catalog', 'all')) == song
+    cache.invalidate(('song', 1))
+    assert cache.key('song', ('song', 1), ('catalog', 'all')) != song
+    assert cache.key('song', ('song', 2)) == other
+
+
+def test_memoize_reloads_after_invalidation():
+    cache = create_cache()
+    loads = []
+    def load():
+        loads.append(1)
+        return len(loads)
+    assert cache.memoize(cache.key('value', ('song', 1)), load) == 1
+    assert cache.memoize(cache.key('value', ('song', 1)), load) == 1
+    cache.invalidate(('song', 1))
+    assert cache.memoize(cache.key('value', ('song', 1)), load) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_rating_invalidates_song_album_and_playlist(db, client, make_user, make_song):
+    creator = make_user('creator')
+    listener = make_user()
+    song_id = make_song(creator)
+    album = music_app.Album(name='Album', creator_id=creator)
+    playlist = music_app.Playlist(name='Playlist', user_id=listener)
+    db.session.add_all([album, playlist])
+    db.session.flush()
+    db.session.execute(music_app.album_song_association.insert().values(album_id=album.id, song_id=song_id))
+    db.session.execute(music_app.playlist_song_association.insert().values(playlist_id=playlist.id, song_id=song_id))
+    tags = [('song', song_id), ('catalog', 'all'), ('album', album.id), ('playlist', playlist.id)]
+    db.session.commit()
+    before = {tag: music_app.cache.version(*tag) for tag in tags}
+    log_in(client, listener)
+    assert client.post(f'/rate/{song_id}', data={'rating': 4}).status_code == 302
+    assert all(music_app.cache.version(*tag) != before[tag] for tag in tags)
+    assert db.session.get(music_app.Song, song_id).rating == 4.0
+    db.session.commit()
+
+
+def test_role_change_reaches_cached_session_user(db, client, make_user):
+    user_id = make_user()
+    assert music_app.load_user(str(user_id)).user_type == 'user'
+    db.session.commit()
+    log_in(client, user_id)
+    client.post('/become_creator')
+    assert music_app.load_user(str(user_id)).user_type == 'creator'
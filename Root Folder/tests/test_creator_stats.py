@@ -0,0 +1,49 @@
+import pytest
+
+import app as music_app
+from conftest import log_in, upload_song
+
+CreatorStats = music_app.CreatorStats
+Song = music_app.Song
+
+
+def creator_stats(db, creator_id):
+    db.session.expire_all()
+    stats = db.session.get(CreatorStats, creator_id)
+    counts = stats and (stats.song_count, stats.rating_count, stats.rating_sum)
+    db.session.commit()
+    return counts
+
+
+@pytest.mark.parametrize('summarised', [False, True])
+def test_delete_song_keeps_creator_stats_exact(db, client, make_user, make_song, summarised):
+    creator = make_user('creator')
+    listener = make_user()
+    kept, deleted = make_song(creator), make_song(creator)
+    db.session.add_all([music_app.Rating(user_id=listener, song_id=deleted, rating=5),
+                        music_app.Rating(user_id=listener, song_id=kept, rating=2)])
+    db.session.execute(db.update(Song).where(Song.id == deleted).values(rating_count=1, rating_sum=5))
+    db.session.execute(db.update(Song).where(Song.id == kept).values(rating_count=1, rating_sum=2))
+    if summarised:
+        CreatorStats.refresh(creator)
+    db.session.commit()
+    log_in(client, creator)
+    assert client.post(f'/delete_song/{deleted}', data={'confirmation': 'yes'}).status_code == 302
+    assert creator_stats(db, creator) == (1, 1, 2)
+
+
+def test_upload_creates_missing_creator_stats(db, client, make_user, make_song):
+    creator = make_user('creator')
+    make_song(creator)
+    log_in(client, creator)
+    assert upload_song(client, 'Fresh upload').status_code == 302
+    assert creator_stats(db, creator) == (2, 0, 0)
+
+
+def test_rating_creates_missing_creator_stats(db, client, make_user, make_song):
+    creator = make_user('creator')
+    listener = make_user()
+    song_id = make_song(creator)
+    log_in(client, listener)
+    assert client.post(f'/rate/{song_id}', data={'rating': 4}).status_code == 302
+    assert creator_stats(db, creator) == (1, 1, 4)
@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as music_app
+from jobs import Worker, create_job_queue
+
+Job = music_app.Job
+
+
+@pytest.fixture
+def queue(db):
+    queue = create_job_queue(db, Job, backoff_base=1, backoff_cap=1, lease=60)
+    calls = []
+    @queue.handler('echo', concurrency=2)
+    def echo(value):
+        calls.append(value)
+        return {'value': value}
+    @queue.handler('flaky', max_attempts=2)
+    def flaky():
+        raise RuntimeError('boom')
+    @queue.handler('serial', concurrency=1)
+    def serial():
+        return None
+    queue.calls = calls
+    yield queue
+    db.session.rollback()
+    Job.query.delete()
+    db.session.commit()
+
+
+def test_enqueue_runs_handler_and_stores_result(queue, db):
+    job = queue.enqueue('echo', {'value': 3})
+    db.session.commit()
+    assert queue.run_pending() == 1
+    job = db.session.get(Job, job.id)
+    assert (job.status, job.attempts, job.result, queue.calls) == ('done', 1, '{"value": 3}', [3])
+
+
+def test_enqueue_with_key_reuses_queued_job(queue, db):
+    first = queue.enqueue('echo', {'value': 1}, key='echo:1')
+    db.session.commit()
+    second = queue.enqueue('echo', {'value': 1}, key='echo:1')
+    db.session.commit()
+    assert first.id == second.id
+    queue.run_pending()
+    third = queue.enqueue('echo', {'value': 1}, key='echo:1')
+    db.session.commit()
+    assert third.id != first.id
+
+
+def test_failed_job_backs_off_then_fails(queue, db):
+    job = queue.enqueue('flaky')
+    db.session.commit()
+    job_id = job.id
+    queue.run_pending()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts) == ('queued', 1)
+    assert job.run_at > datetime.utcnow()
+    assert queue.run_pending() == 0
+    job.run_at = datetime.utcnow()
+    db.session.commit()
+    queue.run_pending()
+    job = db.session.get(Job, job_id)
+    assert (job.status, job.attempts, job.error) == ('failed', 2, 'RuntimeError: boom')
+
+
+def test_concurrency_limit_per_kind(queue, db):
+    running = queue.enqueue('serial')
+    waiting = queue.enqueue('serial')
+    other = queue.enqueue('echo', {'value': 1})
+    db.session.commit()
+    running.status, running.locked_at, running.attempts = 'running', datetime.utcnow(), 1
+    db.session.commit()
+    claimed = queue.claim('test')
+    assert claimed.id == other.id
+    assert queue.claim('test') is None
+    assert db.session.get(Job, waiting.id).status == 'queued'
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out(queue, db):
+    expired = datetime.utcnow() - timedelta(seconds=120)
+    retry = queue.enqueue('echo', {'value': 1})
+    spent = queue.enqueue('echo', {'value': 2})
+    db.session.commit()
+    retry.status, retry.locked_at, retry.attempts = 'running', expired, 1
+    spent.status, spent.locked_at, spent.attempts = 'running', expired, spent.max_attempts
+    db.session.commit()
+    assert queue.claim('test').id == retry.id
+    assert db.session.get(Job, retry.id).attempts == 2
+    assert queue.claim('test') is None
+    spent = db.session.get(Job, spent.id)
+    assert (spent.status, spent.attempts) == ('failed', spent.max_attempts)
+
+
+def test_concurrent_claims_take_each_job_once(app, queue, db):
+    jobs = [queue.enqueue('echo', {'value': value}) for value in range(2)]
+    db.session.flush()
+    job_ids = [job.id for job in jobs]
+    db.session.commit()
+    claimed = []
+    def claim(index):
+        with app.app_context():
+            job = queue.claim(f'test:{index}')
+            if job is not None:
+                claimed.append(job.id)
+    threads = [threading.Thread(target=claim, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == job_ids
+
+
+def test_worker_survives_database_errors(app, queue, monkeypatch):
+    results = [RuntimeError('database is locked'), None]
+    def claim(worker_id, kinds=None):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    monkeypatch.setattr(queue, 'claim', claim)
+    worker = Worker(app, queue, threads=1, poll_interval=0.01, burst=True)
+    assert worker.run() == (0, 0)
+    assert results == []
@@ -0,0 +1,31 @@
+from lyrics import decode_lyrics, encode_lyrics, parse_lrc, plain_text
+
+
+def test_parse_lrc_orders_timed_lines_and_repeats_shared_text():
+    lines, timed = parse_lrc("[ar:Someone]\n[00:12.50]Second\n[00:01.00][01:02.25]Chorus\n")
+    assert timed
+    assert lines == [
+        {'time': 1.0, 'text': 'Chorus'},
+        {'time': 12.5, 'text': 'Second'},
+        {'time': 62.25, 'text': 'Chorus'},
+    ]
+
+
+def test_parse_lrc_applies_offset_without_going_negative():
+    lines, _ = parse_lrc("[offset:+500]\n[00:00.20]Early\n[00:02.00]Later")
+    assert [line['time'] for line in lines] == [0.0, 1.5]
+
+
+def test_parse_lrc_keeps_untimed_lyrics_as_plain_text():
+    lines, timed = parse_lrc("First line\n\nSecond line")
+    assert not timed
+    assert [line['text'] for line in lines] == ['First line', '', 'Second line']
+    assert plain_text("[00:01.00]Hello\n[00:02.00]World") == 'Hello\nWorld'
+
+
+def test_lyrics_round_trip_through_compression():
+    text = "[00:01.00]La la la\n" * 100
+    body, encoding = encode_lyrics(text)
+    assert encoding == 'zlib' and len(body) < len(text)
+    assert decode_lyrics(body, encoding) == text
+    assert encode_lyrics('short') == (b'short', None)
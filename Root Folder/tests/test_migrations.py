@@ -0,0 +1,43 @@
+import app as music_app
+
+Song = music_app.Song
+SchemaMigration = music_app.SchemaMigration
+
+
+def test_upgrade_schema_is_idempotent(db):
+    music_app.upgrade_schema()
+    music_app.upgrade_schema()
+    versions = db.session.execute(db.select(SchemaMigration.version)).scalars().all()
+    assert sorted(versions) == list(range(1, len(music_app.MIGRATIONS) + 1))
+
+
+def test_association_rebuild_drops_duplicates_and_ranks_positions(db, make_user, make_song):
+    owner = make_user()
+    first, second, third = (make_song(owner) for _ in range(3))
+    table = music_app.playlist_song_association
+    db.session.execute(db.text(f"DROP TABLE {table.name}"))
+    db.session.execute(db.text(f"CREATE TABLE {table.name} (playlist_id INTEGER, song_id INTEGER)"))
+    rows = [(9001, third), (9001, first), (9001, third), (9002, second), (9001, None)]
+    db.session.execute(db.text(f"INSERT INTO {table.name} VALUES (:playlist_id, :song_id)"),
+                       [{'playlist_id': playlist_id, 'song_id': song_id} for playlist_id, song_id in rows])
+    music_app.add_lookup_indexes(db.inspect(db.session.connection()))
+    music_app.add_track_positions(db.inspect(db.session.connection()))
+    db.session.commit()
+    assert db.inspect(db.engine).get_pk_constraint(table.name)['constrained_columns'] == ['playlist_id', 'song_id']
+    migrated = db.session.execute(db.select(table).order_by(table.c.playlist_id, table.c.position)).all()
+    assert [tuple(row) for row in migrated] == [(9001, first, 0), (9001, third, 1), (9002, second, 0)]
+    db.session.execute(table.delete().where(table.c.playlist_id.in_([9001, 9002])))
+    db.session.commit()
+
+
+def test_backfill_gives_undated_songs_the_oldest_upload_date(db, make_user, make_song):
+    owner = make_user()
+    make_song(owner)
+    undated = db.session.execute(
+        db.insert(Song).values(title='Undated', artist='Artist', genre='Rock', user_id=owner, created_at=None).returning(Song.id)
+    ).scalar()
+    oldest = db.session.query(db.func.min(Song.created_at)).scalar()
+    music_app.backfill_song_created_at(None)
+    db.session.commit()
+    assert db.session.get(Song, undated).created_at == oldest
+    assert db.session.query(Song).filter(Song.created_at.is_(None)).count() == 0
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+import app as music_app
+
+Song = music_app.Song
+
+
+def test_cursor_pages_cover_every_song_once(db, make_user, make_song):
+    creator = make_user('creator')
+    start = datetime(2024, 1, 1)
+    song_ids = [make_song(creator, start + timedelta(minutes=index // 2)) for index in range(7)]
+    query = Song.query.filter_by(user_id=creator)
+    seen, cursor = [], None
+    while True:
+        songs, cursor = music_app.paginate_songs(query, cursor, per_page=3)
+        seen.extend(song.id for song in songs)
+        if cursor is None:
+            break
+    expected = [song.id for song in query.order_by(Song.created_at.desc(), Song.id.desc())]
+    assert seen == expected
+    assert sorted(seen) == song_ids
+
+
+def test_cursor_for_song_without_upload_date(db):
+    cursor = music_app.encode_cursor(Song(id=5, created_at=None))
+    assert music_app.decode_cursor(cursor) == (music_app.CURSOR_FLOOR, 5)
+
+
+def test_malformed_cursor_is_rejected(db):
+    with pytest.raises(BadRequest):
+        music_app.decode_cursor('yesterday')
+
+
+def test_api_walks_the_catalog_by_cursor(db, client, make_user, make_song):
+    creator = make_user('creator')
+    for _ in range(music_app.CATALOG_PAGE_SIZE + 5):
+        make_song(creator)
+    total = Song.query.count()
+    db.session.commit()
+    seen, url = [], '/api/songs'
+    while url:
+        page = client.get(url).get_json()
+        seen.extend(song['id'] for song in page['songs'])
+        url = page['next_cursor'] and f"/api/songs?cursor={page['next_cursor']}"
+    assert len(seen) == len(set(seen)) == total
+    assert client.get('/api/songs?cursor=nonsense').status_code == 400
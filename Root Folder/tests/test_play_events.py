@@ -0,0 +1,14 @@
+import pytest
+
+from conftest import log_in
+
+
+@pytest.mark.parametrize('payload', [[1], 'x', 7, None, {'song_id': 'abc'}, {}])
+def test_record_play_rejects_malformed_json(client, make_user, payload):
+    log_in(client, make_user())
+    assert client.post('/events/play', json=payload).status_code == 400
+
+
+def test_record_play_rejects_malformed_form(client, make_user):
+    log_in(client, make_user())
+    assert client.post('/events/play', data={'song_id': '1; drop'}).status_code == 400
@@ -0,0 +1,100 @@
+import app as music_app
+from conftest import log_in, upload_song
+
+Song = music_app.Song
+
+
+def search(db, query, **kwargs):
+    db.session.expire_all()
+    songs, has_next = music_app.search_songs(query, **kwargs)
+    titles = [song.title for song in songs]
+    db.session.commit()
+    return titles, has_next
+
+
+def test_title_matches_rank_above_lyrics_and_genre_matches(db, make_user, make_song):
+    creator = make_user('creator')
+    in_lyrics = make_song(creator, title='Quiet harbour')
+    in_genre = make_song(creator, title='Loud harbour', genre='Zephyrwave')
+    in_title = make_song(creator, title='Zephyrwave')
+    music_app.SongLyrics.save(in_lyrics, 'a zephyrwave rolls in')
+    music_app.index_songs([in_lyrics, in_genre, in_title])
+    db.session.commit()
+    assert search(db, 'zephyrwave') == (['Zephyrwave', 'Loud harbour', 'Quiet harbour'], False)
+
+
+def test_prefix_matches_and_suggestions(db, client, make_user, make_song):
+    creator = make_user('creator')
+    song_id = make_song(creator, title='Moonlightyard serenade')
+    music_app.index_songs([song_id])
+    db.session.commit()
+    assert search(db, 'moonl') == (['Moonlightyard serenade'], False)
+    assert search(db, 'serenade moonlighty') == (['Moonlightyard serenade'], False)
+    suggestions = client.get('/search_suggest', query_string={'query': 'moonlig'}).get_json()['suggestions']
+    assert [suggestion['id'] for suggestion in suggestions] == [song_id]
+
+
+def test_results_are_paged(db, make_user, make_song):
+    creator = make_user('creator')
+    music_app.index_songs([make_song(creator, title=f'Pagerock {n}') for n in range(5)])
+    db.session.commit()
+    first, first_has_next = search(db, 'pagerock', page=1, per_page=2)
+    second, second_has_next = search(db, 'pagerock', page=2, per_page=2)
+    third, third_has_next = search(db, 'pagerock', page=3, per_page=2)
+    assert (len(first), len(second), len(third)) == (2, 2, 1)
+    assert (first_has_next, second_has_next, third_has_next) == (True, True, False)
+    assert len(set(first + second + third)) == 5
+
+
+def test_upload_and_edit_keep_the_index_in_sync(db, client, make_user):
+    creator = make_user('creator')
+    log_in(client, creator)
+    assert upload_song(client, 'Glacierhymn', lyrics='ice and snowfallen light').status_code == 302
+    assert search(db, 'glacierhymn')[0] == ['Glacierhymn']
+    assert search(db, 'snowfallen')[0] == ['Glacierhymn']
+    song_id = db.session.execute(db.select(Song.id).where(Song.title == 'Glacierhymn')).scalar_one()
+    db.session.commit()
+    response = client.post(f'/edit_song/{song_id}', data={'title': 'Volcanohymn', 'singer': 'Singer', 'genre': 'Rock',
+                                                          'release_date': '2024-01-01', 'lyrics': 'lava and emberfall'})
+    assert response.status_code == 302
+    assert search(db, 'volcanohymn')[0] == ['Volcanohymn']
+    assert search(db, 'emberfall')[0] == ['Volcanohymn']
+    assert search(db, 'glacierhymn')[0] == []
+    assert search(db, 'snowfallen')[0] == []
+
+
+def test_lyrics_routes_reindex_the_song(db, client, make_user, make_song):
+    creator = make_user('creator')
+    song_id = make_song(creator, title='Lyricless tune')
+    music_app.index_songs([song_id])
+    db.session.commit()
+    log_in(client, creator)
+    assert client.post(f'/add_lyrics/{song_id}', data={'lyrics': 'first thunderverse'}).status_code == 302
+    assert search(db, 'thunderverse')[0] == ['Lyricless tune']
+    assert client.post(f'/edit_lyrics/{song_id}', data={'edited_lyrics': 'second rainverse'}).status_code == 302
+    assert search(db, 'rainverse')[0] == ['Lyricless tune']
+    assert search(db, 'thunderverse')[0] == []
+
+
+def test_deleted_song_drops_out_of_the_index(db, client, make_user, make_song):
+    creator = make_user('creator')
+    kept, deleted = make_song(creator, title='Fernglow kept'), make_song(creator, title='Fernglow gone')
+    music_app.index_songs([kept, deleted])
+    db.session.commit()
+    log_in(client, creator)
+    assert client.post(f'/delete_song/{deleted}', data={'confirmation': 'yes'}).status_code == 302
+    assert search(db, 'fernglow') == (['Fernglow kept'], False)
+    indexed = db.session.execute(db.text("SELECT rowid FROM song_search WHERE rowid = :id"), {'id': deleted}).all()
+    db.session.commit()
+    assert indexed == []
+
+
+def test_create_search_index_rebuilds_a_stale_index(db, make_user, make_song):
+    creator = make_user('creator')
+    make_song(creator, title='Unindexed driftwood')
+    assert search(db, 'driftwood')[0] == []
+    music_app.create_search_index()
+    assert search(db, 'driftwood')[0] == ['Unindexed driftwood']
+    indexed = db.session.execute(db.text("SELECT count(*) FROM song_search")).scalar()
+    assert indexed == Song.get_total_tracks_count()
+    db.session.commit()
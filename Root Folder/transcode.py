@@ -0,0 +1,52 @@
+import os
+import shutil
+import subprocess
+import time
+
+RENDITIONS = (64, 128, 256)
+SEGMENT_SECONDS = 6
+
+
+def select_renditions(source_bitrate, renditions=RENDITIONS):
+    if not source_bitrate:
+        return list(renditions)
+    return [bitrate for bitrate in renditions if bitrate <= max(source_bitrate, renditions[0])]
+
+
+def encode_rendition(ffmpeg, source_path, output_dir, bitrate, segment_seconds=SEGMENT_SECONDS):
+    rendition_dir = os.path.join(output_dir, str(bitrate))
+    os.makedirs(rendition_dir, exist_ok=True)
+    subprocess.run([
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', source_path,
+        '-vn', '-map', '0:a:0', '-c:a', 'aac', '-b:a', f'{bitrate}k',
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(rendition_dir, 'segment_%04d.ts'),
+        os.path.join(rendition_dir, 'index.m3u8'),
+    ], check=True, capture_output=True)
+
+
+def write_master_playlist(output_dir, bitrates):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for bitrate in bitrates:
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bitrate * 1000},CODECS="mp4a.40.2"')
+        lines.append(f'{bitrate}/index.m3u8')
+    with open(os.path.join(output_dir, 'master.m3u8'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def transcode_to_hls(source_path, output_dir, source_bitrate=None, ffmpeg='ffmpeg'):
+    started = time.perf_counter()
+    staging_dir = output_dir + '.partial'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    timings = {}
+    bitrates = select_renditions(source_bitrate)
+    for bitrate in bitrates:
+        rendition_started = time.perf_counter()
+        encode_rendition(ffmpeg, source_path, staging_dir, bitrate)
+        timings[str(bitrate)] = round(time.perf_counter() - rendition_started, 3)
+    write_master_playlist(staging_dir, bitrates)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    timings['total'] = round(time.perf_counter() - started, 3)
+    return timings